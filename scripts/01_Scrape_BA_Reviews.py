@@ -9,12 +9,17 @@ from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 
-from bs4 import BeautifulSoup
 import pandas as pd
 import time
-from datetime import datetime
 import random
 
+import instrumentation
+import storage
+from page_archive import PageArchive
+from page_fetcher import PageFetcher
+from review_index import ReviewIndex, review_key
+from review_parser import parse_page
+
 # ----
 # 2) Optional debug flag and debug function
 # ----
@@ -24,158 +29,139 @@ def debug_print(message):
     if DEBUG:
         print(f"DEBUG: {message}")
 
+# Timers and memory samples go to traces/01-<time>-<pid>.json
+instrumentation.start_run("01")
+
+# Fetch pages over N_SESSIONS concurrent HTTP sessions (see page_fetcher.py)
+# instead of scrolling through them one by one in a single Chrome window
+USE_HTTP_FETCHER = True
+N_SESSIONS = 4
+
+# Only collect reviews we have not seen before: stop paging at the first page
+# made up entirely of known reviews and add only the new rows to the table
+INCREMENTAL = True
+
+# Crawl every page even when it only holds known reviews (e.g. to pick up
+# reviews missed by an interrupted run); still only new reviews are saved.
+# Deleting review_index.sqlite does not do this: an empty index is re-seeded
+# from the raw table straight away.
+FULL_REFRESH = False
+
+# Keep a compressed copy of every fetched page in page_archive.gz so reviews
+# can be re-extracted offline (`python page_archive.py extract`)
+ARCHIVE_PAGES = True
+
 # ----
 # 3) Set up Selenium driver
 # ----
-debug_print("Initializing Chrome options...")
-chrome_options = Options()
-# chrome_options.add_argument('--headless')  # Uncomment if you want headless browsing
-chrome_options.add_argument(
-    'user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
-    '(KHTML, like Gecko) Chrome/120.0.6099.216 Safari/537.36'
-)
+def start_driver():
+    debug_print("Initializing Chrome options...")
+    chrome_options = Options()
+    # chrome_options.add_argument('--headless')  # Uncomment if you want headless browsing
+    chrome_options.add_argument(
+        'user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
+        '(KHTML, like Gecko) Chrome/120.0.6099.216 Safari/537.36'
+    )
+
+    try:
+        chrome_driver = webdriver.Chrome(options=chrome_options)
+        debug_print("Chrome driver initialized successfully.")
+    except Exception as e:
+        debug_print(f"Failed to initialize Chrome driver: {e}")
+        raise
+    return chrome_driver
 
-try:
-    driver = webdriver.Chrome(options=chrome_options)
-    debug_print("Chrome driver initialized successfully.")
-except Exception as e:
-    debug_print(f"Failed to initialize Chrome driver: {e}")
-    raise
+driver = None if USE_HTTP_FETCHER else start_driver()
 
 # ----
 # 4) Global variables and lists
 # ----
 base_url = "https://www.trustpilot.com/review/www.britishairways.com"
-debug_print(f"Navigating to {base_url}...")
-driver.get(base_url)
+if driver is not None:
+    debug_print(f"Navigating to {base_url}...")
+    driver.get(base_url)
 
 raw_reviews = []  # we’ll store each review as a dictionary
 
+review_index = None
+if INCREMENTAL:
+    review_index = ReviewIndex("review_index.sqlite")
+    if len(review_index) == 0 and storage.exists(storage.RAW):
+        # First incremental run: index what the last full scrape collected
+        existing = storage.load_table(storage.RAW, columns=["author", "date", "content"])
+        review_index.seed_from_reviews(existing.to_dict("records"))
+        debug_print(f"Seeded review index with {len(review_index)} existing reviews.")
+
+archive = PageArchive() if ARCHIVE_PAGES else None
+
+def archive_page(url, html, page):
+    if archive is not None:
+        with instrumentation.timer("scrape.archive"):
+            archive.add(url, html, page)
+
+def all_known(reviews):
+    return not FULL_REFRESH and review_index is not None and bool(reviews) and all(
+        review_key(r) in review_index for r in reviews
+    )
+
 # ----
-# 5) Scraping function
+# 5) Parsing and scraping functions
 # ----
-def scrape_page(url):
+def parse_reviews(page_source):
+    """Extract the review cards of one page (see review_parser.py)."""
+    with instrumentation.timer("scrape.parse"):
+        reviews = parse_page(page_source, log=debug_print)
+    instrumentation.count("scrape.pages")
+    instrumentation.count("scrape.reviews", len(reviews))
+    debug_print(f"Parsed {len(reviews)} reviews on this page.")
+    return reviews
+
+def scrape_page(url, page=None):
     global driver, raw_reviews
     
     try:
         debug_print(f"Scraping page: {url}")
-        driver.get(url)
+        with instrumentation.timer("scrape.fetch", url=url):
+            driver.get(url)
 
-        # Wait for reviews to load
-        try:
-            WebDriverWait(driver, 15).until(
-                EC.presence_of_all_elements_located(
-                    (By.CLASS_NAME, 'styles_reviewCardInner__UZk1x')
+            # Wait for reviews to load
+            try:
+                WebDriverWait(driver, 15).until(
+                    EC.presence_of_all_elements_located(
+                        (By.CLASS_NAME, 'styles_reviewCardInner__UZk1x')
+                    )
                 )
-            )
-        except Exception as e:
-            debug_print(f"Error waiting for reviews to load: {e}")
-            return
+            except Exception as e:
+                debug_print(f"Error waiting for reviews to load: {e}")
+                # Keep the page anyway, in case the review markup changed
+                archive_page(url, driver.page_source, page)
+                return
 
         # Scroll to load all reviews
-        last_height = driver.execute_script("return document.body.scrollHeight")
-        scroll_count = 0
-        max_scrolls = 15
-        while scroll_count < max_scrolls:
-            driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-            time.sleep(random.uniform(3, 6))  # random delay
-            new_height = driver.execute_script("return document.body.scrollHeight")
-            scroll_count += 1
-            debug_print(f"Scroll attempt {scroll_count}, new height: {new_height}")
-            if new_height == last_height:
-                # Check how many reviews we have
-                review_elements = driver.find_elements(By.CLASS_NAME, 'styles_reviewCardInner__UZk1x')
-                if len(review_elements) >= 20:  # typically ~20 reviews per page
-                    debug_print(f"Found {len(review_elements)} review elements, stopping scroll.")
-                    break
-                else:
-                    debug_print("No additional reviews found, continuing scroll...")
-            last_height = new_height
-
-        # Parse
-        soup = BeautifulSoup(driver.page_source, 'html.parser')
-        review_containers = soup.find_all('div', class_='styles_reviewCardInner__UZk1x')
-        debug_print(f"Found {len(review_containers)} review containers on this page.")
-
-        for review in review_containers:
-            try:
-                # --- Date of experience ---
-                date_elem = review.find(
-                    'p',
-                    class_='typography_body-m__k2UI7 typography_appearance-default__t8iAq',
-                    attrs={'data-service-review-date-of-experience-typography': 'true'}
-                )
-                if date_elem:
-                    date_text = date_elem.text.strip()
-                    if "Date of experience:" in date_text:
-                        date_str = date_text.replace("Date of experience:", "").strip()
-                    else:
-                        date_str = date_text
-                else:
-                    time_elem = review.find('time', class_='data-service-review-date-time-ago')
-                    if time_elem and 'datetime' in time_elem.attrs:
-                        dt_str = time_elem['datetime'].split('T')[0]
-                        date_str = datetime.strptime(dt_str, "%Y-%m-%d").strftime("%B %d, %Y")
-                    else:
-                        date_str = "Not specified"
-
-                # --- Author name ---
-                author_elem = review.find('span', class_='typography_heading-xxs__UmE9o typography_appearance-default__t8iAq')
-                if author_elem:
-                    author = author_elem.text.strip()
-                else:
-                    author_link = review.find('a', class_='link_internal__Eam_b link_wrapper__ahpyq styles_consumerDetails__DW9Hp')
-                    if author_link:
-                        author_span = author_link.find('span', class_='typography_heading-xxs__UmE9o')
-                        author = author_span.text.strip() if author_span else "Unknown"
+        with instrumentation.timer("scrape.scroll_wait", url=url):
+            last_height = driver.execute_script("return document.body.scrollHeight")
+            scroll_count = 0
+            max_scrolls = 15
+            while scroll_count < max_scrolls:
+                driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+                time.sleep(random.uniform(3, 6))  # random delay
+                new_height = driver.execute_script("return document.body.scrollHeight")
+                scroll_count += 1
+                debug_print(f"Scroll attempt {scroll_count}, new height: {new_height}")
+                if new_height == last_height:
+                    # Check how many reviews we have
+                    review_elements = driver.find_elements(By.CLASS_NAME, 'styles_reviewCardInner__UZk1x')
+                    if len(review_elements) >= 20:  # typically ~20 reviews per page
+                        debug_print(f"Found {len(review_elements)} review elements, stopping scroll.")
+                        break
                     else:
-                        author = "Unknown"
+                        debug_print("No additional reviews found, continuing scroll...")
+                last_height = new_height
 
-                # --- Location / place ---
-                place_elem = review.find(
-                    'div',
-                    class_='typography_body-m__k2UI7 typography_appearance-subtle__PYOVM styles_detailsIcon__ch_FY'
-                )
-                if place_elem and place_elem.find('span'):
-                    place = place_elem.find('span').text.strip()
-                else:
-                    place = "Not specified"
-
-                # --- Review content ---
-                content_elem = review.find(
-                    'p',
-                    class_='typography_body-l__v5JLj typography_appearance-default__t8iAq typography_color-black__wpn7m'
-                )
-                content = content_elem.text.strip() if content_elem else "No content"
-
-                # --- Overall rating ---
-                rating_elem = review.find('div', class_='star-rating_starRating__sdbkn star-rating_medium__Oj7C9')
-                overall_rating = 0
-                if rating_elem:
-                    stars_img = rating_elem.find('img', alt=lambda x: x and 'star' in x.lower())
-                    if stars_img and 'stars-' in stars_img['src']:
-                        rating_str = stars_img['src'].split('stars-')[-1].split('.svg')[0]
-                        overall_rating = int(rating_str)
-
-                # --- Verified status ---
-                verified = "Not Verified"
-                if (review.find('div', class_='review-content-header__review-verified')
-                    or review.find('span', class_='verified-badge')):
-                    verified = "Verified"
-
-                # Collect data
-                raw_reviews.append({
-                    "date": date_str,
-                    "author": author,
-                    "place": place,
-                    "content": content,
-                    "overall_rating": overall_rating,
-                    "verified": verified
-                })
-
-            except Exception as e:
-                debug_print(f"Error processing a review: {e}")
-                continue
+        # Archive, then parse
+        page_source = driver.page_source
+        archive_page(url, page_source, page)
+        raw_reviews.extend(parse_reviews(page_source))
 
     except Exception as e:
         debug_print(f"Page scraping failed: {e}")
@@ -189,48 +175,111 @@ def scrape_page(url):
 current_page = 1
 max_pages = 555
 
-while current_page <= max_pages:
-    page_url = f"{base_url}?page={current_page}"
-    scrape_page(page_url)
+if USE_HTTP_FETCHER:
+    # Pages are plain server-rendered HTML, so no scrolling is needed; a page
+    # without review cards means we have gone past the last one
+    parsed_pages = {}
 
-    # If we found no reviews, stop
-    if len(raw_reviews) == 0:
-        debug_print("No reviews found at all, stopping.")
-        break
+    def page_is_end(page, html):
+        # Archive every fetched page first: if the card class is renamed,
+        # these are the pages the offline re-extraction needs
+        archive_page(fetcher.page_url(page), html, page)
+        if 'styles_reviewCardInner__UZk1x' not in html:
+            return True
+        parsed_pages[page] = parse_reviews(html)
+        return all_known(parsed_pages[page])
 
-    # Attempt to find a "next" button
-    try:
-        next_button = driver.find_element(By.CLASS_NAME, 'pagination-link_next__NdSsd')
-        if not next_button.is_enabled() or "disabled" in next_button.get_attribute("class"):
-            debug_print("No more pages available, stopping.")
+    fetcher = PageFetcher(base_url, n_sessions=N_SESSIONS, log=debug_print)
+    pages = fetcher.fetch(range(current_page, max_pages + 1), is_end=page_is_end)
+    if fetcher.failed:
+        debug_print(f"Pages that failed after retries: {sorted(fetcher.failed)}")
+    for page in pages:
+        raw_reviews.extend(parsed_pages[page])
+else:
+    while current_page <= max_pages:
+        page_url = f"{base_url}?page={current_page}"
+        collected_before = len(raw_reviews)
+        scrape_page(page_url, current_page)
+
+        # If we found no reviews, stop
+        if len(raw_reviews) == 0:
+            debug_print("No reviews found at all, stopping.")
             break
-    except Exception:
-        debug_print("Pagination check failed, assuming no more pages.")
-        break
 
-    current_page += 1
-    debug_print(f"Moving to page {current_page}...")
-    time.sleep(random.uniform(5, 10))
+        if all_known(raw_reviews[collected_before:]):
+            debug_print("Page only has reviews we already know, stopping.")
+            break
+
+        # Attempt to find a "next" button
+        try:
+            next_button = driver.find_element(By.CLASS_NAME, 'pagination-link_next__NdSsd')
+            if not next_button.is_enabled() or "disabled" in next_button.get_attribute("class"):
+                debug_print("No more pages available, stopping.")
+                break
+        except Exception:
+            debug_print("Pagination check failed, assuming no more pages.")
+            break
+
+        current_page += 1
+        debug_print(f"Moving to page {current_page}...")
+        with instrumentation.timer("scrape.page_delay"):
+            time.sleep(random.uniform(5, 10))
 
 # ----
 # 7) Create a DataFrame from raw reviews and save
 # ----
 debug_print(f"Total raw reviews collected: {len(raw_reviews)}")
-df_raw = pd.DataFrame(raw_reviews)
 
-# Convert rating to int
-df_raw['overall_rating'] = df_raw['overall_rating'].astype(int)
+new_keys = None
+if review_index is not None:
+    # Keep only reviews not seen in earlier runs (or earlier on this run)
+    new_reviews, new_keys = [], set()
+    for review in raw_reviews:
+        key = review_key(review)
+        if key not in review_index and key not in new_keys:
+            new_reviews.append(review)
+            new_keys.add(key)
+    debug_print(f"New reviews since last run: {len(new_reviews)}")
+    raw_reviews = new_reviews
+
+if raw_reviews:
+    df_raw = pd.DataFrame(raw_reviews)
+
+    # Convert rating to int
+    df_raw['overall_rating'] = df_raw['overall_rating'].astype(int)
+
+    # Fill missing
+    df_raw.fillna("Not specified", inplace=True)
+
+    # Save. Parquet cannot be appended to in place, so incremental runs
+    # stream the existing table into a new file chunk by chunk (memory stays
+    # flat) and add the new rows at the end
+    if review_index is not None and storage.exists(storage.RAW):
+        debug_print(f"Appending {len(raw_reviews)} rows to: {storage.RAW}")
+        with storage.TableWriter(storage.RAW) as writer:
+            for chunk in storage.iter_chunks(storage.RAW, chunk_size=100_000):
+                writer.write(chunk)
+            writer.write(df_raw)
+    else:
+        storage.save_table(df_raw, storage.RAW)
+    debug_print(f"Saved raw data to: {storage.parquet_path(storage.RAW)}")
 
-# Fill missing
-df_raw.fillna("Not specified", inplace=True)
+    # Only remember reviews once they are on disk
+    if review_index is not None:
+        review_index.add_many(new_keys)
+else:
+    debug_print("Nothing new to save.")
 
-# Save
-output_file = "raw_ba_reviews.csv"
-df_raw.to_csv(output_file, index=False)
-debug_print(f"Saved raw data to: {output_file}")
+if review_index is not None:
+    review_index.close()
+if archive is not None:
+    debug_print(f"Page archive holds {len(archive)} pages.")
+    archive.close()
 
 # ----
 # 8) Clean up driver
 # ----
-driver.quit()
-debug_print("Driver closed. Scraping done.")
+if driver is not None:
+    driver.quit()
+    debug_print("Driver closed.")
+debug_print("Scraping done.")
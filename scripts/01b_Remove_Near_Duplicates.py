@@ -0,0 +1,58 @@
+# 01b_Remove_Near_Duplicates.py
+
+# ----
+# 1) Imports
+# ----
+import instrumentation
+import storage
+from near_duplicates import NearDuplicateIndex
+from review_index import review_key
+
+instrumentation.start_run("01b")
+
+# Reviews read, hashed and written at a time
+CHUNK_SIZE = 50_000
+
+# ----
+# 2) Index every scraped review
+# ----
+# The index persists in near_duplicates.sqlite, so reviews seen on earlier
+# runs are only looked up and just the newly scraped ones are hashed.
+# Delete the file to rebuild it (e.g. after changing the MinHash settings).
+index = NearDuplicateIndex("near_duplicates.sqlite")
+
+kept = dropped = 0
+kept_keys = set()
+with storage.TableWriter(storage.DEDUPED) as writer:
+    for df in storage.iter_chunks(storage.RAW, chunk_size=CHUNK_SIZE):
+        keys = [review_key(r) for r in df[["author", "date", "content"]].to_dict("records")]
+        with instrumentation.timer("dedup.index", rows=len(df)):
+            clusters = index.add(keys, df["content"])
+
+        # ----
+        # 3) Keep the first review of each near-duplicate cluster
+        # ----
+        # Exact repeats of a review share its key (and so its cluster); only
+        # the first row is kept
+        canonical = []
+        for key, cluster in zip(keys, clusters):
+            keep = key == cluster and key not in kept_keys
+            if keep:
+                kept_keys.add(key)
+            canonical.append(keep)
+        writer.write(df[canonical])
+        kept += sum(canonical)
+        dropped += len(canonical) - sum(canonical)
+
+instrumentation.count("dedup.kept", kept)
+instrumentation.count("dedup.dropped", dropped)
+print(f"Kept {kept} reviews, dropped {dropped} near-duplicates "
+      f"(index holds {len(index)} reviews).")
+print(f"Saved to '{storage.parquet_path(storage.DEDUPED)}'.")
+
+largest = index.largest_clusters(5)
+if largest:
+    print("Largest near-duplicate clusters (canonical review key, size):")
+    for key, size in largest:
+        print(f"  {key}  {size}")
+index.close()
@@ -3,52 +3,91 @@
 # ----
 # 1) Imports
 # ----
-import pandas as pd
-from transformers import pipeline
+import instrumentation
+import storage
+from model_backends import SENTIMENT_MODEL, STAR_MODEL, backend_key, load_pipeline
+from sentiment_inference import CombinedScorer, ResultCache, score_combined, score_texts
+
+# Per-batch inference latency is recorded in traces/03-<time>-<pid>.json
+instrumentation.start_run("03")
 
 # ----
 # 2) Load the data with fuzzy matches
 # ----
-df_raw = pd.read_csv("raw_ba_reviews_with_fuzzy_matches.csv")
+df_raw = storage.load_table(storage.FUZZY)
+
+# Results are cached on disk per (model, review text), so re-runs only
+# score new or edited reviews. Delete the file to force a full re-score.
+BATCH_SIZE = 32
+cache = ResultCache("inference_cache.sqlite")
+
+# Inference backend: "pytorch" (fp32), "int8", "onnx" or "onnx-int8".
+# Models are loaded from MODEL_DIR; prepare them once with
+# `python model_backends.py export --backend <backend>`.
+BACKEND = "pytorch"
+MODEL_DIR = "models"
+
+# "separate": the binary sentiment model and the star model each score every
+# review (512-character truncation), as this stage always has.
+# "combined": one star-model pass per review, truncated at 512 tokens; binary
+# sentiment is derived from the star distribution and per-row probabilities
+# (sentiment_score, star_prob_1..5) are added. Roughly halves scoring cost.
+SCORING = "separate"
+
+# Combined mode only: split reviews longer than 512 tokens into up to this
+# many overlapping windows and average their scores (1 = truncate)
+MAX_WINDOWS = 1
+
+if SCORING == "combined":
+    # ==========================================
+    # PART A + B: one pass through the star model
+    # ==========================================
+    star_pipeline = load_pipeline(STAR_MODEL, BACKEND, MODEL_DIR)
+    scores = score_combined(
+        df_raw["content"], CombinedScorer(star_pipeline), cache,
+        model=backend_key(STAR_MODEL, BACKEND), batch_size=BATCH_SIZE,
+        max_windows=MAX_WINDOWS, debug=True
+    )
+    for col, values in scores.items():
+        df_raw[col] = values
 
-# ==========================================
-# PART A: Simple (binary) sentiment analysis
-# ==========================================
-sentiment_pipeline = pipeline("sentiment-analysis")
+    storage.save_table(df_raw, storage.SENTIMENT)
+    print(f"Saved binary sentiment predictions to '{storage.parquet_path(storage.SENTIMENT)}'.")
+    cache.close()
 
-binary_sentiments = []
-for text in df_raw["content"]:
-    # Truncate text if extremely long (avoid model token limit issues)
-    result = sentiment_pipeline(text[:512])[0]
-    binary_sentiments.append(result["label"])  # "POSITIVE" or "NEGATIVE"
+else:
+    # ==========================================
+    # PART A: Simple (binary) sentiment analysis
+    # ==========================================
+    sentiment_pipeline = load_pipeline(SENTIMENT_MODEL, BACKEND, MODEL_DIR)
 
-df_raw["pred_sentiment"] = binary_sentiments
+    # Reviews are truncated to 512 characters, batched by token length
+    df_raw["pred_sentiment"] = score_texts(
+        df_raw["content"], sentiment_pipeline, cache, model=backend_key(SENTIMENT_MODEL, BACKEND),
+        batch_size=BATCH_SIZE, debug=True
+    )  # "POSITIVE" or "NEGATIVE"
 
-# Save intermediate
-df_raw.to_csv("raw_ba_reviews_with_sentiment.csv", index=False)
-print("Saved binary sentiment predictions to 'raw_ba_reviews_with_sentiment.csv'.")
+    # Save intermediate
+    storage.save_table(df_raw, storage.SENTIMENT)
+    print(f"Saved binary sentiment predictions to '{storage.parquet_path(storage.SENTIMENT)}'.")
 
-# ==========================================
-# PART B: Star-rating prediction
-# ==========================================
-star_pipeline = pipeline(
-    "sentiment-analysis",
-    model="nlptown/bert-base-multilingual-uncased-sentiment"
-)
+    # ==========================================
+    # PART B: Star-rating prediction
+    # ==========================================
+    star_pipeline = load_pipeline(STAR_MODEL, BACKEND, MODEL_DIR)
 
-star_ratings = []
-for text in df_raw["content"]:
-    # Again truncate
-    result = star_pipeline(text[:512])[0]
-    star_ratings.append(result["label"])  # e.g. "4 stars"
+    df_raw["pred_star_ratings"] = score_texts(
+        df_raw["content"], star_pipeline, cache, model=backend_key(STAR_MODEL, BACKEND),
+        batch_size=BATCH_SIZE, debug=True
+    )  # e.g. "4 stars"
 
-df_raw["pred_star_ratings"] = star_ratings
+    cache.close()
 
 # ----
 # 3) Save final result with star ratings
 # ----
-df_raw.to_csv("raw_ba_reviews_with_star_ratings.csv", index=False)
-print("Saved star ratings to 'raw_ba_reviews_with_star_ratings.csv'.")
+storage.save_table(df_raw, storage.STAR_RATINGS)
+print(f"Saved star ratings to '{storage.parquet_path(storage.STAR_RATINGS)}'.")
 
 # Quick check
 print(df_raw[["content", "pred_sentiment", "pred_star_ratings"]].head(10))
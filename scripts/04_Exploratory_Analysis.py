@@ -3,57 +3,101 @@
 # ----
 # 1) Imports
 # ----
-import pandas as pd
-from sklearn.feature_extraction.text import CountVectorizer
-from sklearn.decomposition import LatentDirichletAllocation
+import matplotlib
+matplotlib.use("Agg")  # render plots to files, no display needed
 import matplotlib.pyplot as plt
+from sklearn.decomposition import LatentDirichletAllocation
 from wordcloud import WordCloud
 
-# (If you want bigram analysis separately)
-from sklearn.feature_extraction.text import CountVectorizer
+import instrumentation
+import storage
+import topic_sweep
+from topic_modeling import count_corpus, document_counts, update_topic_model
 
-# ----
-# 2) Load data (with star ratings or whichever stage you like)
-# ----
-df_raw = pd.read_csv("raw_ba_reviews_with_star_ratings.csv")
-
-# ==========================================
-# PART A: Topic modeling (LDA)
-# ==========================================
-vectorizer = CountVectorizer(stop_words="english", max_features=1000)
-X = vectorizer.fit_transform(df_raw["content"].dropna())
-
-lda = LatentDirichletAllocation(n_components=5, random_state=42)
-lda.fit(X)
-
-feature_names = vectorizer.get_feature_names_out()
-for topic_idx, topic in enumerate(lda.components_):
-    print(f"Topic {topic_idx}:")
-    print(" ".join(
-        [feature_names[i] for i in topic.argsort()[:-10 - 1:-1]]
-    ))
-    print("")
-
-# ==========================================
-# PART B: Bigram analysis
-# ==========================================
-bigram_vectorizer = CountVectorizer(
-    ngram_range=(2,2),
-    stop_words="english",
-    max_features=20
-)
-X2 = bigram_vectorizer.fit_transform(df_raw["content"].dropna())
-bigrams = bigram_vectorizer.get_feature_names_out()
-print("Top bigrams:")
-print(bigrams)
-
-# ==========================================
-# PART C: WordCloud
-# ==========================================
-text = " ".join(str(review) for review in df_raw["content"].dropna())
-wordcloud = WordCloud(width=800, height=400, background_color="white").generate(text)
-
-plt.figure(figsize=(10,5))
-plt.imshow(wordcloud, interpolation="bilinear")
-plt.axis("off")
-plt.show()
+# Fit topics with online LDA, saving the model so later runs only fold in
+# new reviews (False = one batch fit over the whole corpus)
+STREAMING_TOPICS = True
+
+# Also fit LDA for a range of topic counts and seeds in parallel and report
+# held-out perplexity, coherence and fit time (written to topic_sweep.json)
+SWEEP_TOPICS = False
+SWEEP_TOPIC_COUNTS = range(3, 11)
+SWEEP_SEEDS = (0, 1, 2)
+
+
+def main():
+    instrumentation.start_run("04")
+
+    # Reviews with star ratings are read a chunk at a time, so memory
+    # follows the chunk size rather than the number of reviews. A counting
+    # pass over the chunks gives the bigram totals, the word frequencies
+    # and the topic vocabulary; the topics then need a second pass that
+    # vectorizes each chunk over that vocabulary. Once a streaming model
+    # exists, new reviews are tokenized a single time for all three.
+
+    # ==========================================
+    # PART A: Topic modeling (LDA)
+    # ==========================================
+    X = None
+    with instrumentation.timer("eda.topics", streaming=STREAMING_TOPICS):
+        if STREAMING_TOPICS:
+            topic_model = update_topic_model(storage.STAR_RATINGS, "topic_model.joblib")
+            corpus = topic_model.corpus
+            vocabulary = topic_model.vocabulary
+            topics = topic_model.top_words(10)
+        else:
+            corpus = count_corpus(storage.STAR_RATINGS)
+            vocabulary = corpus.top_unigrams(1000)
+            X = document_counts(storage.STAR_RATINGS, vocabulary)
+
+            lda = LatentDirichletAllocation(n_components=5, random_state=42)
+            lda.fit(X)
+
+            topics = [[vocabulary[i] for i in topic.argsort()[:-10 - 1:-1]]
+                      for topic in lda.components_]
+
+    for topic_idx, words in enumerate(topics):
+        print(f"Topic {topic_idx}:")
+        print(" ".join(words))
+        print("")
+
+    if SWEEP_TOPICS:
+        with instrumentation.timer("eda.topic_sweep"):
+            if X is None:
+                X = document_counts(storage.STAR_RATINGS, vocabulary)
+            results = topic_sweep.sweep(
+                X,
+                topic_counts=SWEEP_TOPIC_COUNTS,
+                seeds=SWEEP_SEEDS,
+            )
+        print("Topic count sweep (mean over seeds):")
+        for row in topic_sweep.summarize(results):
+            print(f"  k={row['n_topics']:>2}  perplexity={row['heldout_perplexity']:.1f}  "
+                  f"coherence={row['umass_coherence']:.3f}  fit={row['fit_seconds']:.1f}s")
+
+    # ==========================================
+    # PART B: Bigram analysis
+    # ==========================================
+    bigrams = corpus.top_bigrams(20)
+    print("Top bigrams:")
+    print(bigrams)
+
+    # ==========================================
+    # PART C: WordCloud
+    # ==========================================
+    with instrumentation.timer("eda.wordcloud"):
+        wordcloud = WordCloud(width=800, height=400, background_color="white").generate_from_frequencies(
+            corpus.word_frequencies(200)
+        )
+
+        plt.figure(figsize=(10,5))
+        plt.imshow(wordcloud, interpolation="bilinear")
+        plt.axis("off")
+        plt.savefig("wordcloud.png", bbox_inches="tight")
+        plt.close()
+    print("Saved word cloud to 'wordcloud.png'.")
+
+
+# The topic sweep's worker processes re-import this file
+if __name__ == "__main__":
+    main()
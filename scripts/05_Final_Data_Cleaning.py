@@ -1,135 +1,158 @@
 import pandas as pd
 import numpy as np
-import airportsdata
+
+import instrumentation
+import storage
+from geo_lookup import GeoResolver
+from review_query import AggregateStore
+from route_lookup import coalesce, load_airports, place_country_codes, standardize_routes
 
 # ----
 # 1) Imports & Setup
 # ----
-# Load city coordinates from worldcities.csv
-city_data = pd.read_csv("worldcities.csv")
-city_coords = {(row["city"], row["iso2"]): (row["lat"], row["lng"]) 
-               for _, row in city_data.dropna(subset=["iso2"]).iterrows()}
-
-# Load IATA airport data for conversion
-iata_dict = airportsdata.load("IATA")
-
-def iata_to_city(iata_code):
-    """Convert IATA code to city name and country code."""
-    if not iata_code or len(str(iata_code)) != 3 or not str(iata_code).isupper():
-        return (iata_code, None)
-    airport = iata_dict.get(iata_code, {})
-    return (airport.get("city", iata_code), airport.get("country", None))
-
-def get_location(city_name, country_code=None):
-    """Retrieve latitude and longitude using city name and country code."""
-    if not city_name or city_name == "Unknown Route":
-        return (None, None)
-    
-    # Normalize city name
-    city_name = city_name.strip().title()
-    
-    # Map airport-specific names to cities
-    airport_mappings = {
-        "Heathrow": "London",
-        "London City": "London",
-        "London Heat": "London"  # Add if seen in your data
-    }
-    city_name = airport_mappings.get(city_name, city_name)
-    
-    # Match with country code if provided
-    if country_code and (city_name, country_code) in city_coords:
-        return city_coords[(city_name, country_code)]
-    # Fallback: match city name alone
-    for (city, cc), coords in city_coords.items():
-        if city == city_name:
-            return coords
-    # Fallback for missing cities (e.g., manual mappings)
-    custom_mappings = {
-        "Rio De Janeiro": ("BR", -22.9068, -43.1729),  # Approximate coordinates
-        "Las Vegas": ("US", 36.1699, -115.1398)         # Approximate coordinates
-    }
-    if city_name in custom_mappings:
-        country, lat, lon = custom_mappings[city_name]
-        return (lat, lon)
-    return (None, None)
+# Per-step times go to traces/05-<time>-<pid>.json
+instrumentation.start_run("05")
 
-# ----
-# 2) Load Review Data
-# ----
-df = pd.read_csv("raw_ba_reviews_with_star_ratings.csv")
+# Load the city coordinate index (built from worldcities.csv on first run,
+# then reused from worldcities_index.parquet)
+with instrumentation.timer("clean.load_geo_index"):
+    geo = GeoResolver.load("worldcities.csv")
 
-# Check for place column and print sample values for debugging
-if "place" in df.columns:
-    print("Place column exists. Sample values:")
-    print(df["place"].head(10))
-else:
-    print("Place column does not exist.")
+# Load the trimmed IATA airport table (cached to disk after the first run)
+with instrumentation.timer("clean.load_airports"):
+    airports = load_airports()
 
-# ----
-# 3) Data Cleaning
-# ----
-df["author"] = df["author"].fillna("Anonymous")
+# Rows cleaned at a time. Peak memory follows the chunk size rather than
+# the size of the review archive.
+CHUNK_SIZE = 100_000
+
+# Strings with few distinct values are kept as categoricals throughout
 pred_cols = ["pred_aircraft", "pred_traveller_type", "pred_seat_type", "pred_route"]
-df[pred_cols] = df[pred_cols].replace("Not specified", np.nan)
-df["verified"] = df["verified"].map({"Verified": True, "Not Verified": False})
-df["date"] = pd.to_datetime(df["date"], errors="coerce")
-df.dropna(subset=["content"], inplace=True)
-df["overall_rating"] = df["overall_rating"].astype("category")
-df["pred_star_ratings"] = df["pred_star_ratings"].str.extract(r'(\d)').astype(float)
-df.drop_duplicates(subset=["content", "author", "date"], keep="first", inplace=True)
 
-# ----
-# 4) Convert IATA Codes and Extract Routes
-# ----
-df["route_city"] = df["pred_route"].fillna("Unknown Route")
-
-def convert_route(route):
-    if " to " not in route or route == "Unknown Route":
-        return route, None, None
-    origin, dest = route.split(" to ")
-    origin_city, origin_country = iata_to_city(origin.strip())
-    dest_city, dest_country = iata_to_city(dest.strip())
-    return f"{origin_city} to {dest_city}", origin_country, dest_country
-
-# Apply conversion and split country codes
-df[["route_city", "origin_country_code", "dest_country_code"]] = pd.DataFrame(
-    df["route_city"].apply(convert_route).tolist(), index=df.index
-)
-
-# Extract origin and destination cities
-df["origin_city"] = df["route_city"].apply(lambda x: x.split(" to ")[0] if " to " in str(x) else None)
-df["dest_city"] = df["route_city"].apply(lambda x: x.split(" to ")[1] if " to " in str(x) else None)
-
-# Use place column for country codes if available, otherwise use IATA-derived codes
-if "place" in df.columns:
-    df["place_country_code"] = df["place"].apply(
-        lambda x: x.split(",")[-1].strip().upper() if isinstance(x, str) and "," in x else None
-    )
-    # Prioritize place-derived country codes, fall back to IATA-derived
-    df["origin_country_code"] = df["origin_country_code"].combine_first(df["place_country_code"])
-    df["dest_country_code"] = df["dest_country_code"].combine_first(df["place_country_code"])
-
-# Apply coordinate lookup with country codes
-df["origin_coords"] = df.apply(lambda row: get_location(row["origin_city"], row["origin_country_code"]), axis=1)
-df["dest_coords"] = df.apply(lambda row: get_location(row["dest_city"], row["dest_country_code"]), axis=1)
-
-# Split coordinates into lat/lon
-df["origin_lat"], df["origin_lon"] = zip(*df["origin_coords"])
-df["dest_lat"], df["dest_lon"] = zip(*df["dest_coords"])
+
+def without_label(values: pd.Series, label: str) -> pd.Series:
+    """Categorical copy of values with `label` turned into NaN."""
+    values = values.astype("category")
+    if label in values.cat.categories:
+        values = values.cat.remove_categories([label])
+    return values
+
+
+def star_numbers(values: pd.Series) -> pd.Series:
+    """ "4 stars" -> 4.0 as float32, parsed once per distinct label."""
+    values = values.astype("category")
+    digits = pd.to_numeric(values.cat.categories.astype(str).str.extract(r'(\d)', expand=False),
+                           errors="coerce")
+    # code -1 (missing) selects the trailing NaN
+    lookup = np.append(np.asarray(digits, dtype=np.float32), np.float32(np.nan))
+    return pd.Series(lookup[values.cat.codes.to_numpy()], index=values.index)
+
+
+def drop_seen_duplicates(df: pd.DataFrame, seen: np.ndarray) -> np.ndarray:
+    """
+    Drop (in place) rows whose (content, author, date) appeared earlier in
+    this chunk or in an earlier one, and return the updated `seen`. Earlier
+    rows are remembered as sorted 64-bit hashes, 8 bytes per row, instead
+    of keeping their text.
+    """
+    keys = pd.util.hash_pandas_object(df[["content", "author", "date"]], index=False).to_numpy()
+    duplicate = pd.Series(keys).duplicated().to_numpy()
+    if len(seen):
+        pos = np.minimum(np.searchsorted(seen, keys), len(seen) - 1)
+        duplicate |= seen[pos] == keys
+    df.drop(index=df.index[duplicate], inplace=True)
+    return np.union1d(seen, keys)
+
+
+seen = np.empty(0, dtype=np.uint64)
+preview = None
+
+# Aggregates behind `python review_query.py ...`; only reviews the store has
+# not seen on an earlier run are added to it
+aggregates = AggregateStore("review_aggregates.sqlite")
+aggregated = 0
 
 # ----
-# 5) Save Final Dataset
+# 2) Load Review Data (chunk by chunk) and save as we go
 # ----
-df.to_csv("cleaned_ba_reviews_with_geodata.csv", index=False)
+# Parquet for downstream code, plus the CSV copy people open by hand
+with storage.TableWriter(storage.CLEANED, csv=True) as writer:
+    for df in storage.iter_chunks(storage.STAR_RATINGS, chunk_size=CHUNK_SIZE):
+        instrumentation.count("clean.rows_in", len(df))
+
+        # Check for place column and print sample values for debugging
+        if preview is None:
+            if "place" in df.columns:
+                print("Place column exists. Sample values:")
+                print(df["place"].head(10))
+            else:
+                print("Place column does not exist.")
+
+        # ----
+        # 3) Data Cleaning
+        # ----
+        with instrumentation.timer("clean.basic_cleaning", rows=len(df)):
+            df["author"] = df["author"].fillna("Anonymous")
+            for col in pred_cols:
+                df[col] = without_label(df[col], "Not specified")
+            df["verified"] = df["verified"].map({"Verified": True, "Not Verified": False})
+            df["date"] = pd.to_datetime(df["date"], errors="coerce")
+            df.dropna(subset=["content"], inplace=True)
+            df["overall_rating"] = df["overall_rating"].astype("category")
+            df["pred_star_ratings"] = star_numbers(df["pred_star_ratings"])
+
+        with instrumentation.timer("clean.deduplicate", rows=len(df)):
+            seen = drop_seen_duplicates(df, seen)
+
+        # ----
+        # 4) Convert IATA Codes and Extract Routes
+        # ----
+        # Split routes and resolve IATA codes once per distinct route, then
+        # attach route_city, origin/dest country codes and origin/dest cities
+        # as categoricals
+        with instrumentation.timer("clean.routes"):
+            routes = standardize_routes(df["pred_route"], airports)
+            for col in routes.columns:
+                df[col] = routes[col]
+
+        # Use place column for country codes if available, otherwise use IATA-derived codes
+        with instrumentation.timer("clean.country_codes"):
+            if "place" in df.columns:
+                df["place_country_code"] = place_country_codes(df["place"])
+                # Prioritize place-derived country codes, fall back to IATA-derived
+                df["origin_country_code"] = coalesce(df["origin_country_code"], df["place_country_code"])
+                df["dest_country_code"] = coalesce(df["dest_country_code"], df["place_country_code"])
+
+        # Coordinate lookup with country codes: each distinct city/country
+        # pair is resolved once, straight into float32 columns
+        with instrumentation.timer("clean.coordinates"):
+            df["origin_lat"], df["origin_lon"] = geo.resolve_many(df["origin_city"], df["origin_country_code"])
+            df["dest_lat"], df["dest_lon"] = geo.resolve_many(df["dest_city"], df["dest_country_code"])
+
+        # ----
+        # 5) Save Final Dataset
+        # ----
+        with instrumentation.timer("clean.save"):
+            writer.write(df)
+        with instrumentation.timer("clean.aggregates", rows=len(df)):
+            aggregated += aggregates.add(df)
+        instrumentation.count("clean.rows_out", len(df))
+        if preview is None:
+            preview = df.head(10)
+
+instrumentation.count("clean.rows_aggregated", aggregated)
+print(f"Added {aggregated} new reviews to the query aggregates ({len(aggregates)} in total).")
+aggregates.close()
 
 # Debugging output
-print(df[["route_city", "origin_city", "dest_city", "origin_country_code", "dest_country_code", 
-         "origin_lat", "origin_lon", "dest_lat", "dest_lon"]].head(10))
+if preview is not None:
+    print(preview[["route_city", "origin_city", "dest_city", "origin_country_code", "dest_country_code",
+                   "origin_lat", "origin_lon", "dest_lat", "dest_lon"]])
 
 # ----
 # 6) Check for Missing Cities in worldcities.csv
 # ----
 missing_cities = ["Rio De Janeiro", "Las Vegas"]
 for city in missing_cities:
-    found = any(city in c for c, _ in city_coords.keys())
+    found = geo.has_city_like(city)
     print(f"{city} found in worldcities.csv: {found}")
\ No newline at end of file
@@ -0,0 +1,16 @@
+# benchmarks
+#
+# Timed, memory-tracked benchmarks of the pipeline's heavy steps, run on a
+# deterministic synthetic corpus so no scraped data is needed.
+#
+#   python -m benchmarks run --scale 100k             # from the scripts directory
+#   python -m benchmarks compare old.json new.json    # flag regressions
+
+import os
+import sys
+
+# The pipeline modules live next to this package and import each other as
+# top-level modules, the way the stage scripts do
+SCRIPTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if SCRIPTS_DIR not in sys.path:
+    sys.path.insert(0, SCRIPTS_DIR)
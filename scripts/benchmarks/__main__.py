@@ -0,0 +1,129 @@
+# __main__.py
+#
+#   python -m benchmarks run --scale 1k                      # generate if needed, run all
+#   python -m benchmarks run --scale 1m --only fuzzy_matching --workers 8
+#   python -m benchmarks compare results/v1.json results/v2.json
+
+# ----
+# 1) Imports
+# ----
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from datetime import datetime
+from importlib import metadata
+
+from benchmarks.suite import BENCHMARKS, run_one
+from benchmarks.synthetic import SCALES, SEED, write_dataset
+
+DATA_DIR = "benchmark_data"
+RESULTS_DIR = "benchmark_results"
+# A benchmark this much slower (or hungrier) than the baseline is flagged
+REGRESSION_TOLERANCE = 1.10
+PACKAGES = ["pandas", "numpy", "pyarrow", "rapidfuzz", "lxml", "scikit-learn"]
+
+
+def _version(package):
+    try:
+        return metadata.version(package)
+    except metadata.PackageNotFoundError:
+        return None
+
+
+# ----
+# 2) Run
+# ----
+def run(scale, seed=SEED, only=None, workers=1, repeat=1, data_dir=DATA_DIR) -> dict:
+    """
+    Generate (or reuse) the synthetic dataset for `scale` and run the
+    benchmarks on it. Each benchmark runs `repeat` times in a fresh
+    interpreter; the fastest run is kept, with the highest peak RSS.
+    """
+    directory = os.path.join(data_dir, f"{scale}-seed{seed}")
+    start = time.perf_counter()
+    manifest = write_dataset(directory, SCALES[scale], seed)
+    print(f"Dataset {directory}: {manifest['reviews']} reviews, {manifest['pages']} pages "
+          f"({time.perf_counter() - start:.1f}s)")
+
+    results = {}
+    for name in only or BENCHMARKS:
+        runs = [run_one(name, directory, workers) for _ in range(repeat)]
+        best = min(runs, key=lambda r: r["seconds"])
+        best["peak_rss_mb"] = max(r["peak_rss_mb"] for r in runs)
+        best["runs"] = len(runs)
+        results[name] = best
+        print(f"{name:>18}: {best['items']} {best['unit']} in {best['seconds']:.2f}s "
+              f"({best['items_per_second'] or 0:.0f}/s), peak RSS {best['peak_rss_mb']:.0f} MB")
+
+    return {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "scale": scale,
+        "seed": seed,
+        "dataset": manifest,
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "packages": {p: _version(p) for p in PACKAGES},
+        "results": results,
+    }
+
+
+# ----
+# 3) Compare two result files
+# ----
+def compare(baseline: dict, current: dict, tolerance=REGRESSION_TOLERANCE) -> list:
+    """Benchmarks whose time or peak RSS grew by more than `tolerance`."""
+    regressions = []
+    for name, new in current["results"].items():
+        old = baseline["results"].get(name)
+        if old is None:
+            continue
+        for field in ("seconds", "peak_rss_mb"):
+            ratio = new[field] / old[field] if old[field] else 1.0
+            flag = "REGRESSION" if ratio > tolerance else ""
+            print(f"{name:>18} {field:>12}: {old[field]:10.2f} -> {new[field]:10.2f} ({ratio:5.2f}x) {flag}")
+            if flag:
+                regressions.append(f"{name} {field}")
+    return regressions
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(prog="python -m benchmarks",
+                                         description="Benchmark the pipeline on synthetic data.")
+    commands = arg_parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="run benchmarks and write a JSON result file")
+    run_parser.add_argument("--scale", choices=list(SCALES), default="1k")
+    run_parser.add_argument("--seed", type=int, default=SEED)
+    run_parser.add_argument("--only", nargs="*", choices=list(BENCHMARKS), help="subset of benchmarks")
+    run_parser.add_argument("--workers", type=int, default=1, help="processes for fuzzy matching")
+    run_parser.add_argument("--repeat", type=int, default=1)
+    run_parser.add_argument("--data-dir", default=DATA_DIR)
+    run_parser.add_argument("--output", help=f"result file (default: {RESULTS_DIR}/<scale>-<time>.json)")
+
+    compare_parser = commands.add_parser("compare", help="flag regressions between two result files")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--tolerance", type=float, default=REGRESSION_TOLERANCE)
+    args = arg_parser.parse_args()
+
+    if args.command == "run":
+        report = run(args.scale, args.seed, args.only, args.workers, args.repeat, args.data_dir)
+        output = args.output or os.path.join(
+            RESULTS_DIR, f"{args.scale}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+        )
+        os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+        with open(output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {output}")
+    else:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        with open(args.current) as f:
+            current = json.load(f)
+        if baseline.get("scale") != current.get("scale"):
+            print(f"Warning: comparing scale {baseline.get('scale')} with {current.get('scale')}")
+        sys.exit(1 if compare(baseline, current, args.tolerance) else 0)
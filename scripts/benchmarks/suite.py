@@ -0,0 +1,166 @@
+# suite.py
+#
+# The benchmarks themselves. Each one runs in a fresh interpreter (see
+# run_one) so its peak RSS is its own, loads its inputs untimed, then times
+# only the step being measured.
+
+# ----
+# 1) Imports
+# ----
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+import pandas as pd
+
+from benchmarks import SCRIPTS_DIR
+import storage
+
+
+def _rss_mb(who=resource.RUSAGE_SELF) -> float:
+    scale = 1 if sys.platform == "darwin" else 1024
+    return resource.getrusage(who).ru_maxrss * scale / 2**20
+
+
+class Timed:
+    """
+    Marks the measured section of a benchmark: wall time inside the block,
+    and peak RSS before it (the inputs) and after it.
+    """
+
+    def __enter__(self):
+        self.setup_rss_mb = _rss_mb()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.seconds = time.perf_counter() - self.start
+        self.peak_rss_mb = _rss_mb()
+        # Worker processes (fuzzy matching) report their own peak
+        self.children_peak_rss_mb = _rss_mb(resource.RUSAGE_CHILDREN)
+        return False
+
+
+# ----
+# 2) Benchmarks
+# ----
+# Each takes the dataset directory and options, and returns
+# (Timed, items processed, unit, extra fields).
+def fuzzy_matching(directory, workers=1):
+    from keyword_matcher import match_sharded
+
+    keywords = pd.read_csv(os.path.join(directory, "ba_reviews.csv"))
+    reviews = pd.read_parquet(os.path.join(directory, storage.parquet_path(storage.STAR_RATINGS)),
+                              columns=["content"])
+    texts = reviews["content"].str.lower().str.strip().tolist()
+    categories = {
+        "pred_aircraft": list(keywords["aircraft"].dropna().unique()),
+        "pred_traveller_type": list(keywords["traveller_type"].dropna().unique()),
+        "pred_seat_type": list(keywords["seat_type"].dropna().unique()),
+        "pred_route": list(keywords["route"].dropna().unique()),
+    }
+    with Timed() as timed:
+        matches = match_sharded(texts, categories, n_workers=workers)
+    found = sum(value is not None for values in matches.values() for value in values)
+    return timed, len(texts), "reviews", {"workers": workers, "matches": found}
+
+
+def page_parsing(directory, workers=1):
+    from review_parser import load_corpus, parse_page
+
+    pages = load_corpus(os.path.join(directory, "pages"))
+    with Timed() as timed:
+        n_reviews = sum(len(parse_page(html)) for _, html in pages)
+    return timed, len(pages), "pages", {"reviews": n_reviews}
+
+
+def cleaning_geo(directory, workers=1):
+    from geo_lookup import GeoResolver
+    from route_lookup import coalesce, load_airports, place_country_codes, standardize_routes
+
+    os.chdir(directory)  # caches (airports, city index) are written next to the data
+    df = storage.load_table(storage.STAR_RATINGS, columns=["place", "pred_route"])
+    geo = GeoResolver.load("worldcities.csv")
+    airports = load_airports()
+    with Timed() as timed:
+        pred_route = df["pred_route"].astype("category").cat.remove_categories(["Not specified"])
+        routes = standardize_routes(pred_route, airports)
+        place_cc = place_country_codes(df["place"])
+        origin_cc = coalesce(routes["origin_country_code"], place_cc)
+        dest_cc = coalesce(routes["dest_country_code"], place_cc)
+        origin_lat, _ = geo.resolve_many(routes["origin_city"], origin_cc)
+        dest_lat, _ = geo.resolve_many(routes["dest_city"], dest_cc)
+    resolved = int(origin_lat.notna().sum() + dest_lat.notna().sum())
+    return timed, len(df), "reviews", {"coordinates_resolved": resolved}
+
+
+def eda_vectorization(directory, workers=1):
+    """
+    Stage 04's first-run path: a chunked counting pass for the corpus
+    totals and vocabulary, then a chunked pass vectorizing every review
+    over that vocabulary. Both passes read the table, so the read is timed
+    too (the baseline below loads its texts untimed).
+    """
+    from topic_modeling import CHUNK_SIZE, count_corpus, document_counts
+
+    os.chdir(directory)
+    with Timed() as timed:
+        corpus = count_corpus(storage.STAR_RATINGS, CHUNK_SIZE)
+        X = document_counts(storage.STAR_RATINGS, corpus.top_unigrams(1000), CHUNK_SIZE)
+        corpus.top_bigrams(20)
+        corpus.word_frequencies(200)
+    return timed, X.shape[0], "reviews", {"chunk_size": CHUNK_SIZE,
+                                          "terms": len(corpus.unigrams) + len(corpus.bigrams)}
+
+
+def eda_vectorization_single(directory, workers=1):
+    """Baseline for eda_vectorization: one CountVectorizer over the whole corpus."""
+    from text_analysis import SharedTokens
+
+    reviews = pd.read_parquet(os.path.join(directory, storage.parquet_path(storage.STAR_RATINGS)),
+                              columns=["content"])
+    texts = reviews["content"].dropna().astype(str)
+    with Timed() as timed:
+        tokens = SharedTokens(texts)
+        tokens.counts_for(tokens.top_unigrams(1000))
+        tokens.top_bigrams(20)
+    return timed, len(texts), "reviews", {"features": len(tokens.features)}
+
+
+BENCHMARKS = {
+    "fuzzy_matching": fuzzy_matching,
+    "page_parsing": page_parsing,
+    "cleaning_geo": cleaning_geo,
+    "eda_vectorization": eda_vectorization,
+    "eda_vectorization_single": eda_vectorization_single,
+}
+
+
+# ----
+# 3) Running one benchmark in a fresh interpreter
+# ----
+def run_one(name, directory, workers=1) -> dict:
+    """Run benchmark `name` in a child interpreter and return its result."""
+    out = subprocess.run(
+        [sys.executable, "-m", "benchmarks.suite", name, os.path.abspath(directory), str(workers)],
+        cwd=SCRIPTS_DIR, check=True, capture_output=True, text=True,
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+if __name__ == "__main__":
+    name, directory, workers = sys.argv[1], sys.argv[2], int(sys.argv[3])
+    timed, items, unit, extra = BENCHMARKS[name](directory, workers)
+    print(json.dumps({
+        "seconds": timed.seconds,
+        "items": items,
+        "unit": unit,
+        "items_per_second": items / timed.seconds if timed.seconds else None,
+        "setup_rss_mb": timed.setup_rss_mb,
+        "peak_rss_mb": timed.peak_rss_mb,
+        "children_peak_rss_mb": timed.children_peak_rss_mb,
+        **extra,
+    }))
@@ -0,0 +1,325 @@
+# synthetic.py
+#
+# Deterministic synthetic stand-ins for the pipeline's inputs: scraped
+# reviews (as a table and as saved Trustpilot-style HTML pages), the
+# ba_reviews.csv keyword file and worldcities.csv. The same scale and seed
+# always produce the same data.
+
+# ----
+# 1) Imports
+# ----
+import gzip
+import html
+import json
+import os
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+import storage
+
+# ----
+# 2) Scales and defaults
+# ----
+SCALES = {"1k": 1_000, "100k": 100_000, "1m": 1_000_000}
+SEED = 42
+N_KEYWORD_ROWS = 4_000     # about the size of the real ba_reviews.csv
+N_ROUTES = 2_000           # distinct routes in the keyword file
+N_FILLER_CITIES = 45_000   # worldcities.csv has roughly this many rows
+REVIEWS_PER_PAGE = 20      # cards per Trustpilot page
+MAX_PAGES = 5_000          # saved pages are capped; parsing cost is per page
+MANIFEST = "manifest.json"
+
+# IATA code, city as airportsdata spells it, country code
+AIRPORTS = [
+    ("LHR", "London", "GB"), ("LGW", "London", "GB"), ("MAN", "Manchester", "GB"),
+    ("EDI", "Edinburgh", "GB"), ("GLA", "Glasgow", "GB"), ("JFK", "New York", "US"),
+    ("LAX", "Los Angeles", "US"), ("SFO", "San Francisco", "US"), ("ORD", "Chicago", "US"),
+    ("MIA", "Miami", "US"), ("BOS", "Boston", "US"), ("LAS", "Las Vegas", "US"),
+    ("YYZ", "Toronto", "CA"), ("YVR", "Vancouver", "CA"), ("MEX", "Mexico City", "MX"),
+    ("GRU", "Sao Paulo", "BR"), ("GIG", "Rio De Janeiro", "BR"), ("DXB", "Dubai", "AE"),
+    ("DOH", "Doha", "QA"), ("SIN", "Singapore", "SG"), ("HKG", "Hong Kong", "HK"),
+    ("NRT", "Tokyo", "JP"), ("BOM", "Mumbai", "IN"), ("DEL", "Delhi", "IN"),
+    ("BKK", "Bangkok", "TH"), ("KUL", "Kuala Lumpur", "MY"), ("PEK", "Beijing", "CN"),
+    ("PVG", "Shanghai", "CN"), ("SYD", "Sydney", "AU"), ("JNB", "Johannesburg", "ZA"),
+    ("CPT", "Cape Town", "ZA"), ("NBO", "Nairobi", "KE"), ("CAI", "Cairo", "EG"),
+    ("MAD", "Madrid", "ES"), ("BCN", "Barcelona", "ES"), ("LIS", "Lisbon", "PT"),
+    ("FCO", "Rome", "IT"), ("MXP", "Milan", "IT"), ("CDG", "Paris", "FR"),
+    ("AMS", "Amsterdam", "NL"), ("FRA", "Frankfurt", "DE"), ("MUC", "Munich", "DE"),
+    ("ZRH", "Zurich", "CH"), ("GVA", "Geneva", "CH"), ("DUB", "Dublin", "IE"),
+    ("ATH", "Athens", "GR"), ("CPH", "Copenhagen", "DK"), ("OSL", "Oslo", "NO"),
+    ("ARN", "Stockholm", "SE"), ("VIE", "Vienna", "AT"),
+]
+
+AIRCRAFT = [
+    "Boeing 777-200", "Boeing 777-300ER", "Boeing 787-8", "Boeing 787-9", "Boeing 787-10",
+    "Boeing 747-400", "Boeing 767-300", "A380", "A350-1000", "A321neo", "A321", "A320neo",
+    "A320", "A319", "A318", "Embraer 190", "Embraer 170", "Boeing 737-800", "Boeing 757",
+    "Saab 2000", "ATR 72",
+]
+TRAVELLER_TYPES = ["Solo Leisure", "Couple Leisure", "Family Leisure", "Business"]
+SEAT_TYPES = ["Economy Class", "Premium Economy", "Business Class", "First Class"]
+
+SENTENCES = [
+    "The cabin crew were friendly and attentive throughout the flight.",
+    "Boarding was chaotic and the gate staff seemed overwhelmed.",
+    "Food was bland and served lukewarm.",
+    "The seat was comfortable and the legroom was adequate.",
+    "Our flight was delayed by three hours with very little communication.",
+    "The lounge at the airport was crowded but the food was decent.",
+    "Check-in was quick and the bag drop had no queue.",
+    "The entertainment system did not work for most of the flight.",
+    "Customer service refused to help when our luggage went missing.",
+    "Overall a pleasant experience and good value for money.",
+    "The toilets were not cleaned once during a long flight.",
+    "Wifi was expensive and barely usable.",
+    "The pilot kept us informed about the weather and the delay.",
+    "I would not fly with this airline again after this experience.",
+    "We were rebooked onto a later flight without any compensation.",
+    "The crew went above and beyond for my elderly mother.",
+    "Drinks service was slow and they ran out of most options.",
+    "Priority boarding made no difference at all.",
+    "The aircraft looked tired and the seats were worn.",
+    "Landing was smooth and we arrived ahead of schedule.",
+    "Fast track security saved us a lot of time.",
+    "My connecting flight was cancelled and the app gave no information.",
+    "The breakfast was surprisingly good for airline food.",
+    "Staff at the transfer desk were rude and unhelpful.",
+    "Blankets and pillows were provided which was a nice touch.",
+    "Our bags arrived quickly at the carousel.",
+    "The website kept crashing when I tried to choose a seat.",
+    "It was a long flight but the time passed quickly.",
+    "The cabin was too warm for the whole journey.",
+    "Refund took months and several phone calls.",
+]
+
+FIRST_NAMES = ["James", "Mary", "Ahmed", "Priya", "Chen", "Olivia", "Lucas", "Fatima",
+               "Tom", "Sofia", "David", "Aisha", "Mark", "Elena", "Kenji", "Grace"]
+LAST_NAMES = ["Smith", "Jones", "Khan", "Patel", "Wang", "Brown", "Garcia", "Muller",
+              "Taylor", "Rossi", "Williams", "Okafor", "Evans", "Silva", "Sato", "Walsh"]
+SYLLABLES = ["ka", "lo", "mi", "ra", "ten", "bur", "ville", "sta", "no", "per",
+             "dor", "an", "el", "wick", "ford", "ham", "ton", "ber", "gen", "sk"]
+
+
+def _rng(seed, stream):
+    """Independent generator per table, so tables do not shift each other."""
+    return np.random.default_rng([seed, stream])
+
+
+# ----
+# 3) Keyword file, routes and city table
+# ----
+def route_pool(seed=SEED, n_routes=N_ROUTES) -> list:
+    """Distinct routes written as IATA codes, city names, or with a stop."""
+    rng = _rng(seed, 0)
+    routes = set()
+    while len(routes) < n_routes:
+        a, b, c = rng.choice(len(AIRPORTS), size=3, replace=False)
+        style = rng.integers(3)
+        if style == 0:
+            route = f"{AIRPORTS[a][0]} to {AIRPORTS[b][0]}"
+        elif style == 1:
+            route = f"{AIRPORTS[a][1]} to {AIRPORTS[b][1]}"
+        else:
+            route = f"{AIRPORTS[a][1]} to {AIRPORTS[b][1]} via {AIRPORTS[c][1]}"
+        routes.add(route)
+    return sorted(routes)
+
+
+def keyword_table(seed=SEED, n_rows=N_KEYWORD_ROWS) -> pd.DataFrame:
+    """Stand-in for ba_reviews.csv: one labelled review per row, with gaps."""
+    rng = _rng(seed, 1)
+    routes = route_pool(seed)
+
+    def column(values, missing):
+        picked = np.asarray(values, dtype=object)[rng.integers(len(values), size=n_rows)]
+        picked[rng.random(n_rows) < missing] = None
+        return picked
+
+    return pd.DataFrame({
+        "aircraft": column(AIRCRAFT, 0.3),
+        "traveller_type": column(TRAVELLER_TYPES, 0.1),
+        "seat_type": column(SEAT_TYPES, 0.05),
+        # Every route appears at least once, like a real keyword file
+        "route": np.array(routes + list(column(routes, 0.0)[:max(n_rows - len(routes), 0)]),
+                          dtype=object)[:n_rows],
+    })
+
+
+def city_table(seed=SEED, n_filler=N_FILLER_CITIES) -> pd.DataFrame:
+    """
+    Stand-in for worldcities.csv: every airport city plus made-up filler
+    cities, including repeated (city, iso2) rows and rows without iso2.
+    """
+    rng = _rng(seed, 2)
+    countries = sorted({cc for _, _, cc in AIRPORTS} | {
+        a + b for a in "ABCDEFGHIJKLMNOPRSTUVZ" for b in "ABEGKLMNRSTZ"
+    })
+    known = sorted({(city, cc) for _, city, cc in AIRPORTS})
+
+    n_syllables = rng.integers(2, 4, size=n_filler)
+    parts = rng.integers(len(SYLLABLES), size=(n_filler, 3))
+    filler = ["".join(SYLLABLES[p] for p in row[:k]).title() for row, k in zip(parts, n_syllables)]
+    iso2 = np.asarray(countries, dtype=object)[rng.integers(len(countries), size=n_filler)]
+    iso2[rng.random(n_filler) < 0.01] = None
+
+    cities = [city for city, _ in known] + filler
+    codes = [cc for _, cc in known] + list(iso2)
+    n = len(cities)
+    return pd.DataFrame({
+        "city": cities,
+        "city_ascii": cities,
+        "lat": np.round(rng.uniform(-60, 70, size=n), 4),
+        "lng": np.round(rng.uniform(-180, 180, size=n), 4),
+        "country": codes,
+        "iso2": codes,
+        "population": rng.integers(1_000, 10_000_000, size=n),
+    })
+
+
+# ----
+# 4) Reviews
+# ----
+def _misspell(word, rng):
+    """Drop one character, so fuzzy matching has something to do."""
+    i = int(rng.integers(len(word)))
+    return word[:i] + word[i + 1:]
+
+
+def review_table(n_reviews, seed=SEED) -> pd.DataFrame:
+    """
+    Stand-in for the stage 01-03 tables: the scraped columns plus the
+    pred_* columns later stages read. Reviews mention an aircraft, seat,
+    traveller type and route with realistic gaps and the odd typo.
+    """
+    rng = _rng(seed, 3)
+    routes = route_pool(seed)
+    n = n_reviews
+
+    n_sentences = rng.integers(2, 14, size=n)
+    fillers = rng.integers(len(SENTENCES), size=(n, 14))
+    aircraft = rng.integers(len(AIRCRAFT), size=n)
+    seat = rng.integers(len(SEAT_TYPES), size=n)
+    traveller = rng.integers(len(TRAVELLER_TYPES), size=n)
+    route = rng.integers(len(routes), size=n)
+    mentions = rng.random((n, 4)) < (0.6, 0.8, 0.5, 0.7)
+    typos = rng.random(n) < 0.1
+    rating = rng.choice([1, 2, 3, 4, 5], p=[0.35, 0.15, 0.1, 0.15, 0.25], size=n)
+
+    contents, pred = [], {"pred_aircraft": [], "pred_seat_type": [],
+                          "pred_traveller_type": [], "pred_route": []}
+    for i in range(n):
+        sentences = [SENTENCES[f] for f in fillers[i, :n_sentences[i]]]
+        found = dict.fromkeys(pred, "Not specified")
+        if mentions[i, 0]:
+            name = AIRCRAFT[aircraft[i]]
+            sentences.insert(0, f"The {_misspell(name, rng) if typos[i] else name} was {'clean' if rating[i] > 3 else 'dated'}.")
+            found["pred_aircraft"] = name
+        if mentions[i, 1]:
+            sentences.insert(0, f"I flew {SEAT_TYPES[seat[i]]}.")
+            found["pred_seat_type"] = SEAT_TYPES[seat[i]]
+        if mentions[i, 2]:
+            sentences.append(f"Travelling as {TRAVELLER_TYPES[traveller[i]].lower()}.")
+            found["pred_traveller_type"] = TRAVELLER_TYPES[traveller[i]]
+        if mentions[i, 3]:
+            sentences.insert(0, f"We flew {routes[route[i]]}.")
+            found["pred_route"] = routes[route[i]]
+        contents.append(" ".join(sentences))
+        for col, value in found.items():
+            pred[col].append(value)
+
+    first = rng.integers(len(FIRST_NAMES), size=n)
+    last = rng.integers(len(LAST_NAMES), size=n)
+    home = rng.integers(len(AIRPORTS), size=n)
+    with_city = rng.random(n) < 0.5
+    days = rng.integers(0, 3650, size=n)
+    start = date(2016, 1, 1)
+
+    return pd.DataFrame({
+        "date": [(start + timedelta(days=int(d))).strftime("%B %d, %Y") for d in days],
+        "author": [f"{FIRST_NAMES[a]} {LAST_NAMES[b]}" for a, b in zip(first, last)],
+        "place": [f"{AIRPORTS[h][1]}, {AIRPORTS[h][2]}" if c else AIRPORTS[h][2]
+                  for h, c in zip(home, with_city)],
+        "content": contents,
+        "overall_rating": rating,
+        "verified": np.where(rng.random(n) < 0.7, "Verified", "Not Verified"),
+        **pred,
+        "pred_sentiment": np.where(rating >= 3, "POSITIVE", "NEGATIVE"),
+        "pred_star_ratings": [f"{r} star" if r == 1 else f"{r} stars" for r in rating],
+    })
+
+
+# ----
+# 5) Saved Trustpilot pages
+# ----
+_CARD = (
+    '<article><div class="styles_reviewCardInner__UZk1x">'
+    '<a class="link_internal__Eam_b link_wrapper__ahpyq styles_consumerDetails__DW9Hp" href="/users/{uid}">'
+    '<span class="typography_heading-xxs__UmE9o typography_appearance-default__t8iAq">{author}</span></a>'
+    '<div class="typography_body-m__k2UI7 typography_appearance-subtle__PYOVM styles_detailsIcon__ch_FY">'
+    '<span>{place}</span></div>'
+    '<div class="star-rating_starRating__sdbkn star-rating_medium__Oj7C9">'
+    '<img alt="Rated {rating} out of 5 stars" src="https://cdn.trustpilot.net/brand-assets/4.1.0/stars/stars-{rating}.svg"></div>'
+    '{verified}'
+    '<p class="typography_body-l__v5JLj typography_appearance-default__t8iAq typography_color-black__wpn7m">{content}</p>'
+    '<p class="typography_body-m__k2UI7 typography_appearance-default__t8iAq" '
+    'data-service-review-date-of-experience-typography="true"><b>Date of experience:</b> {date}</p>'
+    '</div></article>'
+)
+_VERIFIED_BADGE = '<div class="review-content-header__review-verified">Verified</div>'
+
+
+def page_html(reviews: pd.DataFrame) -> str:
+    """One Trustpilot-style page holding the given reviews as cards."""
+    cards = [
+        _CARD.format(
+            uid=i, author=html.escape(row.author), place=html.escape(row.place),
+            rating=row.overall_rating, content=html.escape(row.content), date=row.date,
+            verified=_VERIFIED_BADGE if row.verified == "Verified" else "",
+        )
+        for i, row in enumerate(reviews.itertuples(index=False))
+    ]
+    return ("<!DOCTYPE html><html><head><title>British Airways Reviews</title></head>"
+            f"<body><main><section>{''.join(cards)}</section></main></body></html>")
+
+
+# ----
+# 6) Writing a dataset
+# ----
+def write_dataset(directory, n_reviews, seed=SEED, max_pages=MAX_PAGES) -> dict:
+    """
+    Write reviews (as the star-ratings table), ba_reviews.csv,
+    worldcities.csv and gzipped pages under directory. An existing dataset
+    for the same size and seed is reused. Returns the manifest.
+    """
+    manifest_path = os.path.join(directory, MANIFEST)
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        if manifest["reviews"] == n_reviews and manifest["seed"] == seed:
+            return manifest
+
+    os.makedirs(os.path.join(directory, "pages"), exist_ok=True)
+    reviews = review_table(n_reviews, seed)
+    cities = city_table(seed)
+    keyword_table(seed).to_csv(os.path.join(directory, "ba_reviews.csv"), index=False)
+    cities.to_csv(os.path.join(directory, "worldcities.csv"), index=False)
+    # Typed like the real stage 03 output
+    storage.to_storage_types(reviews).to_parquet(
+        os.path.join(directory, storage.parquet_path(storage.STAR_RATINGS)), index=False
+    )
+
+    n_pages = min(-(-n_reviews // REVIEWS_PER_PAGE), max_pages)
+    for page in range(n_pages):
+        start = page * REVIEWS_PER_PAGE
+        with gzip.open(os.path.join(directory, "pages", f"page_{page + 1:05d}.html.gz"), "wt",
+                       encoding="utf-8", compresslevel=1) as f:
+            f.write(page_html(reviews.iloc[start:start + REVIEWS_PER_PAGE]))
+
+    manifest = {"reviews": n_reviews, "seed": seed, "pages": n_pages,
+                "routes": N_ROUTES, "keyword_rows": N_KEYWORD_ROWS,
+                "cities": len(cities)}
+    with open(manifest_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
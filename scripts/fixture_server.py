@@ -0,0 +1,122 @@
+# fixture_server.py
+#
+# Serves saved listing pages the way the live site does, so PageFetcher
+# and the scraper can be tried offline:
+#
+#   python fixture_server.py saved_pages/ --port 8000
+#   # then PageFetcher("http://127.0.0.1:8000/reviews")
+#
+# `?page=N` returns the N-th saved page (files sorted by name, *.html or
+# *.html.gz), and any page past the last one is a 404, which is how
+# PageFetcher recognises the end of the listing.
+
+# ----
+# 1) Imports
+# ----
+import argparse
+import gzip
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+# ----
+# 2) Defaults
+# ----
+HOST = "127.0.0.1"
+PORT = 8000
+
+
+# ----
+# 3) Server
+# ----
+def load_pages(directory) -> list:
+    """HTML of every saved page (*.html or *.html.gz) under directory, by file name."""
+    pages = []
+    for path in sorted(Path(directory).rglob("*.htm*")):
+        data = path.read_bytes()
+        if path.suffix == ".gz":
+            data = gzip.decompress(data)
+        pages.append(data.decode("utf-8", errors="replace"))
+    return pages
+
+
+class FixtureServer(ThreadingHTTPServer):
+    """
+    HTTP server over a list of page HTML strings (page 1 first).
+
+    `faults` maps a page number to the responses to give before the real
+    page, one per request: a status code, or (status, Retry-After seconds).
+    Every request is recorded in `requests` as (page, status).
+    """
+
+    daemon_threads = True
+
+    def __init__(self, pages: list, host=HOST, port=PORT, faults=None):
+        super().__init__((host, port), _Handler)
+        self.pages = pages
+        self.faults = {page: list(responses) for page, responses in (faults or {}).items()}
+        self.requests = []
+        self._lock = threading.Lock()
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/reviews"
+
+    def respond(self, page):
+        """(status, extra headers, body) for one request of a page number."""
+        with self._lock:
+            faults = self.faults.get(page)
+            fault = faults.pop(0) if faults else None
+            if fault is not None:
+                status, retry_after = fault if isinstance(fault, tuple) else (fault, None)
+                headers = {"Retry-After": str(retry_after)} if retry_after is not None else {}
+                response = (status, headers, f"HTTP {status}")
+            elif page is None or not 1 <= page <= len(self.pages):
+                response = (404, {}, "Not found")
+            else:
+                response = (200, {}, self.pages[page - 1])
+            self.requests.append((page, response[0]))
+        return response
+
+    def start(self) -> threading.Thread:
+        """Serve from a background thread (stop with shutdown())."""
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return thread
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        values = parse_qs(urlsplit(self.path).query).get("page", ["1"])
+        page = int(values[0]) if values[0].isdigit() else None
+        status, headers, body = self.server.respond(page)
+        data = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Serve saved listing pages as ?page=N.")
+    arg_parser.add_argument("directory", help="saved pages (*.html or *.html.gz), in name order")
+    arg_parser.add_argument("--host", default=HOST)
+    arg_parser.add_argument("--port", type=int, default=PORT)
+    args = arg_parser.parse_args()
+
+    pages = load_pages(args.directory)
+    server = FixtureServer(pages, args.host, args.port)
+    print(f"Serving {len(pages)} pages at {server.base_url}?page=N (404 after page {len(pages)})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    server.server_close()
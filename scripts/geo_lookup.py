@@ -0,0 +1,125 @@
+# geo_lookup.py
+#
+# City -> coordinates resolution used by 05_Final_Data_Cleaning.py
+
+# ----
+# 1) Imports
+# ----
+import os
+
+import numpy as np
+import pandas as pd
+
+# ----
+# 2) Defaults and manual mappings
+# ----
+WORLDCITIES_FILE = "worldcities.csv"
+INDEX_FILE = "worldcities_index.parquet"
+
+# Map airport-specific names to cities
+AIRPORT_MAPPINGS = {
+    "Heathrow": "London",
+    "London City": "London",
+    "London Heat": "London"  # Add if seen in your data
+}
+
+# Fallback for cities missing from worldcities.csv: country, lat, lon
+CUSTOM_MAPPINGS = {
+    "Rio De Janeiro": ("BR", -22.9068, -43.1729),  # Approximate coordinates
+    "Las Vegas": ("US", 36.1699, -115.1398)         # Approximate coordinates
+}
+
+
+def build_index(city_data: pd.DataFrame) -> pd.DataFrame:
+    """
+    Reduce worldcities rows to one (city, iso2, lat, lng) row per pair.
+
+    Matches the old dict-of-rows behaviour: a repeated (city, iso2) keeps
+    the coordinates of its last row but the position of its first, which
+    decides which country wins when looking up a city name alone.
+    """
+    city_data = city_data.dropna(subset=["iso2"])
+    keys = ["city", "iso2"]
+    first = city_data.drop_duplicates(keys, keep="first")[keys]
+    last = city_data.drop_duplicates(keys, keep="last").set_index(keys)[["lat", "lng"]]
+    return first.join(last, on=keys).reset_index(drop=True)
+
+
+# ----
+# 3) Resolver
+# ----
+class GeoResolver:
+    """Looks up coordinates by (city, country code), then by city name alone."""
+
+    def __init__(self, pairs: pd.DataFrame):
+        self.pairs = pairs
+        coords = list(zip(pairs["lat"], pairs["lng"]))
+        self.by_pair = dict(zip(zip(pairs["city"], pairs["iso2"]), coords))
+        by_city = pairs.drop_duplicates("city", keep="first")
+        self.by_city = dict(zip(by_city["city"], zip(by_city["lat"], by_city["lng"])))
+
+    @classmethod
+    def load(cls, worldcities=WORLDCITIES_FILE, index_file=INDEX_FILE):
+        """
+        Use the saved index if it is newer than worldcities.csv, otherwise
+        build it from the CSV and save it for next time.
+        """
+        if os.path.exists(index_file) and (
+            not os.path.exists(worldcities)
+            or os.path.getmtime(index_file) >= os.path.getmtime(worldcities)
+        ):
+            return cls(pd.read_parquet(index_file))
+        pairs = build_index(pd.read_csv(worldcities, usecols=["city", "iso2", "lat", "lng"]))
+        pairs.to_parquet(index_file, index=False)
+        return cls(pairs)
+
+    def resolve(self, city_name, country_code=None):
+        """Retrieve latitude and longitude using city name and country code."""
+        if not isinstance(city_name, str) or not city_name or city_name == "Unknown Route":
+            return (None, None)
+
+        # Normalize city name
+        city_name = city_name.strip().title()
+        city_name = AIRPORT_MAPPINGS.get(city_name, city_name)
+
+        # Match with country code if provided
+        if isinstance(country_code, str) and country_code and (city_name, country_code) in self.by_pair:
+            return self.by_pair[(city_name, country_code)]
+        # Fallback: match city name alone
+        if city_name in self.by_city:
+            return self.by_city[city_name]
+        # Fallback for missing cities (e.g., manual mappings)
+        if city_name in CUSTOM_MAPPINGS:
+            country, lat, lon = CUSTOM_MAPPINGS[city_name]
+            return (lat, lon)
+        return (None, None)
+
+    def resolve_many(self, cities: pd.Series, country_codes: pd.Series):
+        """
+        Resolve whole columns: each distinct (city, country code) pair is
+        looked up once and the result mapped back onto the rows by code,
+        without building per-row tuples or a merged copy of the frame.
+        Returns float32 (lat, lon) Series aligned with `cities`.
+        """
+        city_codes, city_values = pd.factorize(cities)
+        cc_codes, cc_values = pd.factorize(country_codes)
+        # One integer per (city, country code) pair; missing values have code -1
+        base = len(cc_values) + 1
+        pair_codes, pairs = pd.factorize(city_codes.astype(np.int64) * base + cc_codes + 1)
+
+        # A trailing None, so code -1 picks up "missing"
+        city_values = np.append(np.asarray(city_values, dtype=object), None)
+        cc_values = np.append(np.asarray(cc_values, dtype=object), None)
+        coords = np.full((len(pairs), 2), np.nan, dtype=np.float32)
+        for i, pair in enumerate(pairs):
+            lat, lon = self.resolve(city_values[pair // base], cc_values[pair % base - 1])
+            if lat is not None and lon is not None:
+                coords[i] = (lat, lon)
+
+        lat = pd.Series(coords[pair_codes, 0], index=cities.index, dtype=np.float32)
+        lon = pd.Series(coords[pair_codes, 1], index=cities.index, dtype=np.float32)
+        return lat, lon
+
+    def has_city_like(self, name: str) -> bool:
+        """True if any known city name contains `name`."""
+        return bool(self.pairs["city"].str.contains(name, regex=False).any())
@@ -0,0 +1,250 @@
+# instrumentation.py
+#
+# Timers, counters and memory sampling shared by the stage scripts. A stage
+# calls start_run("03") once; every timer() / count() made afterwards (in
+# the stage or in the helper modules) ends up in a JSON trace file written
+# when the process exits:
+#
+#   traces/03-20250101-120000-4242.json
+#
+# Set PIPELINE_PROFILE=cprofile (or pyinstrument, if installed) to also
+# capture a profile of the whole stage next to the trace. PIPELINE_TRACE=0
+# turns trace files off.
+
+# ----
+# 1) Imports
+# ----
+import atexit
+import json
+import os
+import resource
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+# ----
+# 2) Defaults
+# ----
+TRACE_DIR = os.environ.get("PIPELINE_TRACE_DIR", "traces")
+TRACE_ENABLED = os.environ.get("PIPELINE_TRACE", "1") != "0"
+PROFILE = os.environ.get("PIPELINE_PROFILE", "")   # "", "cprofile" or "pyinstrument"
+SAMPLE_INTERVAL = 1.0     # seconds between memory samples
+MAX_SAMPLES = 100_000     # durations kept per timer for percentiles
+MAX_EVENTS = 50_000       # individual spans kept in the trace
+
+
+def memory_mb() -> float:
+    """Current resident set size in MB (peak RSS where /proc is unavailable)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError):
+        scale = 1 if sys.platform == "darwin" else 1024
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 2**20
+
+
+# ----
+# 3) Recorded metrics
+# ----
+class Metrics:
+    """Per-name timer statistics, counters and a bounded list of spans."""
+
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.timers = {}    # name -> {"count", "total", "min", "max", "samples"}
+        self.counters = {}
+        self.events = []
+        self.dropped_events = 0
+
+    def add_time(self, name, seconds, start=None, attrs=None):
+        stat = self.timers.get(name)
+        if stat is None:
+            stat = self.timers[name] = {"count": 0, "total": 0.0, "min": seconds,
+                                        "max": seconds, "samples": []}
+        stat["count"] += 1
+        stat["total"] += seconds
+        stat["min"] = min(stat["min"], seconds)
+        stat["max"] = max(stat["max"], seconds)
+        if len(stat["samples"]) < MAX_SAMPLES:
+            stat["samples"].append(seconds)
+        if start is not None:
+            if len(self.events) < MAX_EVENTS:
+                event = {"name": name, "start": start - self.origin, "seconds": seconds}
+                if attrs:
+                    event.update(attrs)
+                self.events.append(event)
+            else:
+                self.dropped_events += 1
+
+    def add_count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def snapshot(self) -> dict:
+        """Plain-data copy of the timers and counters, e.g. to send from a worker."""
+        return {"timers": {name: dict(stat, samples=list(stat["samples"]))
+                           for name, stat in self.timers.items()},
+                "counters": dict(self.counters)}
+
+    def merge(self, snapshot: dict):
+        """Fold in a snapshot() taken in another process."""
+        for name, other in snapshot["timers"].items():
+            stat = self.timers.setdefault(name, {"count": 0, "total": 0.0, "min": other["min"],
+                                                 "max": other["max"], "samples": []})
+            stat["count"] += other["count"]
+            stat["total"] += other["total"]
+            stat["min"] = min(stat["min"], other["min"])
+            stat["max"] = max(stat["max"], other["max"])
+            stat["samples"].extend(other["samples"][:MAX_SAMPLES - len(stat["samples"])])
+        for name, n in snapshot["counters"].items():
+            self.add_count(name, n)
+
+    def summary(self) -> dict:
+        timers = {}
+        for name, stat in sorted(self.timers.items()):
+            samples = sorted(stat["samples"])
+            timers[name] = {
+                "count": stat["count"],
+                "total_seconds": stat["total"],
+                "mean_seconds": stat["total"] / stat["count"],
+                "min_seconds": stat["min"],
+                "p50_seconds": samples[len(samples) // 2],
+                "p95_seconds": samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+                "max_seconds": stat["max"],
+            }
+        return {"timers": timers, "counters": dict(sorted(self.counters.items()))}
+
+
+class MemorySampler(threading.Thread):
+    """Samples RSS every `interval` seconds in a daemon thread."""
+
+    def __init__(self, origin, interval=SAMPLE_INTERVAL):
+        super().__init__(daemon=True)
+        self.origin = origin
+        self.interval = interval
+        self.samples = []
+        self._done = threading.Event()
+
+    def run(self):
+        while True:
+            self.samples.append((round(time.perf_counter() - self.origin, 3), round(memory_mb(), 1)))
+            if self._done.wait(self.interval):
+                return
+
+    def stop(self):
+        self._done.set()
+
+
+# ----
+# 4) Module-level recording API
+# ----
+_metrics = Metrics()
+_run = {}
+
+
+@contextmanager
+def timer(name: str, **attrs):
+    """Time the block under `name`; attrs are stored with the span in the trace."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _metrics.add_time(name, time.perf_counter() - start, start, attrs)
+
+
+def count(name: str, n=1):
+    _metrics.add_count(name, n)
+
+
+def snapshot() -> dict:
+    return _metrics.snapshot()
+
+
+def merge(worker_snapshot: dict):
+    _metrics.merge(worker_snapshot)
+
+
+def reset():
+    """Start recording afresh (worker processes call this per task)."""
+    global _metrics
+    _metrics = Metrics()
+
+
+def start_run(stage: str, profile=PROFILE, trace=TRACE_ENABLED):
+    """
+    Begin a traced run of `stage`: start memory sampling, the optional
+    profiler, and write the trace (and profile) when the process exits.
+    """
+    if _run:
+        return
+    _run.update(stage=stage, started_at=datetime.now(), start=time.perf_counter(),
+                profile=profile, trace=trace, sampler=MemorySampler(_metrics.origin))
+    _run["sampler"].start()
+
+    if profile == "cprofile":
+        import cProfile
+        _run["profiler"] = cProfile.Profile()
+        _run["profiler"].enable()
+    elif profile == "pyinstrument":
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            print("pyinstrument is not installed; running without a profile")
+        else:
+            _run["profiler"] = Profiler()
+            _run["profiler"].start()
+
+    atexit.register(finish_run)
+
+
+def finish_run():
+    """Stop sampling/profiling and write the trace file; returns its path."""
+    if not _run or _run.get("finished"):
+        return None
+    _run["finished"] = True
+    sampler = _run["sampler"]
+    sampler.stop()
+    sampler.join(timeout=SAMPLE_INTERVAL * 2)
+
+    stem = f"{_run['stage']}-{_run['started_at']:%Y%m%d-%H%M%S}-{os.getpid()}"
+    profile_path = None
+    profiler = _run.get("profiler")
+    if profiler is not None:
+        os.makedirs(TRACE_DIR, exist_ok=True)
+        if _run["profile"] == "cprofile":
+            profiler.disable()
+            profile_path = os.path.join(TRACE_DIR, stem + ".prof")
+            profiler.dump_stats(profile_path)  # open with `python -m pstats` or snakeviz
+        else:
+            profiler.stop()
+            profile_path = os.path.join(TRACE_DIR, stem + ".html")
+            with open(profile_path, "w") as f:
+                f.write(profiler.output_html())
+
+    if not _run["trace"]:
+        return profile_path
+
+    scale = 1 if sys.platform == "darwin" else 1024
+    trace = {
+        "stage": _run["stage"],
+        "argv": sys.argv,
+        "pid": os.getpid(),
+        "started_at": _run["started_at"].isoformat(timespec="seconds"),
+        "finished_at": datetime.now().isoformat(timespec="seconds"),
+        "wall_seconds": time.perf_counter() - _run["start"],
+        **_metrics.summary(),
+        "memory": {
+            "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 2**20,
+            "samples": sampler.samples,
+        },
+        "profile": profile_path,
+        "events": _metrics.events,
+        "dropped_events": _metrics.dropped_events,
+    }
+    os.makedirs(TRACE_DIR, exist_ok=True)
+    path = os.path.join(TRACE_DIR, stem + ".json")
+    with open(path, "w") as f:
+        json.dump(trace, f, indent=1)
+    print(f"Trace written to {path}")
+    return path
@@ -0,0 +1,261 @@
+# keyword_matcher.py
+#
+# Multi-category fuzzy keyword extraction used by 02_Fuzzy_Keyword_Matching.py
+
+# ----
+# 1) Imports
+# ----
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from rapidfuzz import fuzz, process
+
+import instrumentation
+
+# ----
+# 2) Defaults
+# ----
+THRESHOLD = 70
+# Upper bound on keywords x reviews scored per cdist call (float64 cells)
+MAX_CELLS = 4_000_000
+# Shards per worker when no shard size is given (smooths out uneven shards)
+SHARDS_PER_WORKER = 4
+
+
+def find_best_fuzzy_match(text: str, candidates: list, threshold=THRESHOLD) -> str:
+    """
+    Returns the highest scoring candidate via partial fuzzy match
+    if its score >= threshold, else None.
+
+    Reference implementation; KeywordMatcher returns the same answers.
+    """
+    if not isinstance(text, str) or not text.strip():
+        return None
+
+    best_candidate = None
+    best_score = 0
+    text_lower = text.lower()
+
+    for kw in candidates:
+        kw_lower = kw.lower()
+        score = fuzz.partial_ratio(kw_lower, text_lower)
+        if score > best_score:
+            best_score = score
+            best_candidate = kw
+
+    if best_score >= threshold:
+        return best_candidate
+    return None
+
+
+# ----
+# 3) Aho-Corasick automaton for the exact-hit pass
+# ----
+class _ExactHitIndex:
+    """
+    Aho-Corasick automaton over the keywords of every category at once.
+    scan(text) reports, per category, the lowest keyword index that
+    occurs verbatim in text.
+    """
+
+    def __init__(self, categories: list):
+        self.n_categories = len(categories)
+        self.goto = [{}]
+        self.fail = [0]
+        # best[state] = per-category lowest keyword index ending at this state
+        self.best = [[None] * self.n_categories]
+
+        for c, keywords in enumerate(categories):
+            for idx, kw in enumerate(keywords):
+                if kw:
+                    self._add(kw, c, idx)
+        self._link()
+
+    def _add(self, kw, c, idx):
+        state = 0
+        for ch in kw:
+            nxt = self.goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self.goto)
+                self.goto[state][ch] = nxt
+                self.goto.append({})
+                self.fail.append(0)
+                self.best.append([None] * self.n_categories)
+            state = nxt
+        current = self.best[state][c]
+        if current is None or idx < current:
+            self.best[state][c] = idx
+
+    def _link(self):
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self.goto[state].items():
+                queue.append(nxt)
+                f = self.fail[state]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                self.fail[nxt] = self.goto[f].get(ch, 0)
+                # Fold the fail state's hits in so scan() never walks the chain
+                merged = self.best[nxt]
+                for c, idx in enumerate(self.best[self.fail[nxt]]):
+                    if idx is not None and (merged[c] is None or idx < merged[c]):
+                        merged[c] = idx
+
+    def scan(self, text: str) -> list:
+        goto, fail, best = self.goto, self.fail, self.best
+        hits = [None] * self.n_categories
+        state = 0
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if state:
+                for c, idx in enumerate(best[state]):
+                    if idx is not None and (hits[c] is None or idx < hits[c]):
+                        hits[c] = idx
+        return hits
+
+
+# ----
+# 4) Matcher
+# ----
+class KeywordMatcher:
+    """
+    Finds the best partial-ratio keyword of several categories per review.
+
+    Keyword lists are lowercased and deduplicated once. Each review goes
+    through one Aho-Corasick pass over all categories: a verbatim hit
+    scores 100, so the earliest hit in list order is already the answer
+    and that category needs no fuzzy scoring. Remaining (review, category)
+    pairs are scored in batches with rapidfuzz.process.cdist.
+
+    Results are identical to calling find_best_fuzzy_match per category.
+    """
+
+    def __init__(self, categories: dict, threshold=THRESHOLD, workers=-1, max_cells=MAX_CELLS):
+        self.threshold = threshold
+        self.workers = workers
+        self.max_cells = max_cells
+        self.names = list(categories)
+        self.keywords = []   # original spelling, first occurrence of each lowered form
+        self.lowered = []
+        for name in self.names:
+            seen = {}
+            for kw in categories[name]:
+                kw_lower = str(kw).lower()
+                if kw_lower not in seen:
+                    seen[kw_lower] = str(kw)
+            self.lowered.append(list(seen))
+            self.keywords.append(list(seen.values()))
+        self.max_len = [max((len(k) for k in kws), default=0) for kws in self.lowered]
+        self.index = _ExactHitIndex(self.lowered)
+
+    def match(self, text: str) -> dict:
+        """Best keyword (or None) per category for a single review."""
+        return {name: found[0] for name, found in self.match_many([text]).items()}
+
+    def match_many(self, texts) -> dict:
+        """Best keyword (or None) per category for each review, in input order."""
+        texts = list(texts)
+        results = [[None] * len(texts) for _ in self.names]
+        pending = [[] for _ in self.names]  # row numbers still needing fuzzy scoring
+
+        with instrumentation.timer("fuzzy.exact_scan", texts=len(texts)):
+            for row, text in enumerate(texts):
+                if not isinstance(text, str) or not text.strip():
+                    continue
+                text_lower = text.lower()
+                texts[row] = text_lower
+                hits = self.index.scan(text_lower)
+                for c, idx in enumerate(hits):
+                    # A keyword longer than the review could also score 100 by
+                    # containing it, so only trust the exact hit when none exists.
+                    if idx is not None and len(text_lower) >= self.max_len[c]:
+                        results[c][row] = self.keywords[c][idx]
+                    else:
+                        pending[c].append(row)
+
+        for c, name in enumerate(self.names):
+            instrumentation.count(f"fuzzy.scored.{name}", len(pending[c]))
+            if pending[c] and self.lowered[c]:
+                # Per-category fuzzy scoring time
+                with instrumentation.timer(f"fuzzy.match.{name}", texts=len(pending[c]),
+                                           keywords=len(self.lowered[c])):
+                    self._score(c, [texts[r] for r in pending[c]], pending[c], results[c])
+
+        return dict(zip(self.names, results))
+
+    def _score(self, c, texts, rows, out):
+        keywords = self.lowered[c]
+        chunk = max(1, self.max_cells // len(keywords))
+        for start in range(0, len(texts), chunk):
+            batch = texts[start:start + chunk]
+            # keywords x reviews, same argument order as the reference loop
+            scores = process.cdist(
+                keywords, batch,
+                scorer=fuzz.partial_ratio,
+                processor=None,
+                score_cutoff=self.threshold,
+                dtype=np.float64,
+                workers=self.workers,
+            )
+            # argmax keeps the first keyword among equal scores
+            best_idx = scores.argmax(axis=0)
+            best_score = scores[best_idx, np.arange(len(batch))]
+            for j, (idx, score) in enumerate(zip(best_idx, best_score)):
+                if score > 0 and score >= self.threshold:
+                    out[rows[start + j]] = self.keywords[c][idx]
+
+
+# ----
+# 5) Sharded multi-process matching
+# ----
+# Each worker builds its own matcher once from the keyword lists passed in
+# initargs, so tasks only carry their slice of review text.
+_worker_matcher = None
+
+
+def _init_worker(categories: dict, threshold):
+    global _worker_matcher
+    # One process per core already; keep cdist single-threaded inside it
+    _worker_matcher = KeywordMatcher(categories, threshold=threshold, workers=1)
+
+
+def _match_shard(texts: list):
+    # Timings recorded in the worker travel back with the shard's results
+    instrumentation.reset()
+    return _worker_matcher.match_many(texts), instrumentation.snapshot()
+
+
+def match_sharded(texts, categories: dict, threshold=THRESHOLD, n_workers=None, shard_size=None) -> dict:
+    """
+    Same output as KeywordMatcher(categories).match_many(texts), computed
+    over row shards in a process pool and merged back in input order.
+
+    Callers must run this under an `if __name__ == "__main__":` guard,
+    since worker processes may re-import the calling script.
+    """
+    texts = list(texts)
+    n_workers = n_workers or os.cpu_count() or 1
+    if n_workers == 1 or len(texts) < 2:
+        return KeywordMatcher(categories, threshold=threshold).match_many(texts)
+
+    if not shard_size:
+        shard_size = -(-len(texts) // (n_workers * SHARDS_PER_WORKER))
+    shards = [texts[i:i + shard_size] for i in range(0, len(texts), shard_size)]
+
+    results = {name: [] for name in categories}
+    with ProcessPoolExecutor(
+        max_workers=min(n_workers, len(shards)),
+        initializer=_init_worker,
+        initargs=(categories, threshold),
+    ) as pool:
+        # map() yields shard results in submission order
+        for shard_result, timings in pool.map(_match_shard, shards):
+            instrumentation.merge(timings)
+            for name, found in shard_result.items():
+                results[name].extend(found)
+    return results
@@ -0,0 +1,165 @@
+# model_backends.py
+#
+# Selectable CPU inference backends for the stage 03 models, loaded from a
+# local directory so no network access is needed at startup.
+#
+#   python model_backends.py export --backend onnx-int8      # one-off, needs network
+#   python model_backends.py parity --backend onnx-int8      # labels vs fp32
+#
+# The ONNX backends need `pip install optimum[onnxruntime]`.
+
+# ----
+# 1) Imports
+# ----
+import argparse
+import os
+import random
+import time
+
+from transformers import AutoModelForSequenceClassification, AutoTokenizer, pipeline
+
+# ----
+# 2) Models and backends
+# ----
+SENTIMENT_MODEL = "distilbert/distilbert-base-uncased-finetuned-sst-2-english"  # pipeline("sentiment-analysis") default
+STAR_MODEL = "nlptown/bert-base-multilingual-uncased-sentiment"
+MODELS = [SENTIMENT_MODEL, STAR_MODEL]
+
+MODEL_DIR = "models"
+# pytorch: fp32 as before; int8: PyTorch dynamic quantization of the Linear
+# layers; onnx / onnx-int8: ONNX Runtime, optionally dynamically quantized
+BACKENDS = ["pytorch", "int8", "onnx", "onnx-int8"]
+
+
+def local_path(model_id: str, backend: str, model_dir=MODEL_DIR) -> str:
+    """Where a model's files for a backend live (int8 reuses the fp32 files)."""
+    flavour = "pytorch" if backend in ("pytorch", "int8") else backend
+    return os.path.join(model_dir, model_id.replace("/", "__"), flavour)
+
+
+def backend_key(model_id: str, backend: str) -> str:
+    """Result-cache name, so labels from different backends are never mixed."""
+    return model_id if backend == "pytorch" else f"{model_id}@{backend}"
+
+
+# ----
+# 3) Export (one-off, needs network)
+# ----
+def export_model(model_id: str, backend: str, model_dir=MODEL_DIR) -> str:
+    """Download model_id and save it in the layout load_pipeline() expects."""
+    path = local_path(model_id, backend, model_dir)
+    tokenizer = AutoTokenizer.from_pretrained(model_id)
+
+    if backend in ("pytorch", "int8"):
+        model = AutoModelForSequenceClassification.from_pretrained(model_id)
+        model.save_pretrained(path)
+    else:
+        from optimum.onnxruntime import ORTModelForSequenceClassification, ORTQuantizer
+        from optimum.onnxruntime.configuration import AutoQuantizationConfig
+
+        model = ORTModelForSequenceClassification.from_pretrained(model_id, export=True)
+        if backend == "onnx-int8":
+            model.save_pretrained(path + "-fp32")
+            quantizer = ORTQuantizer.from_pretrained(path + "-fp32")
+            config = AutoQuantizationConfig.avx2(is_static=False, per_channel=False)
+            quantizer.quantize(save_dir=path, quantization_config=config)
+            # The quantized model.onnx needs the config next to it
+            model.config.save_pretrained(path)
+        else:
+            model.save_pretrained(path)
+
+    tokenizer.save_pretrained(path)
+    return path
+
+
+# ----
+# 4) Loading
+# ----
+def load_pipeline(model_id: str, backend="pytorch", model_dir=MODEL_DIR):
+    """
+    Text-classification pipeline for model_id on the chosen backend,
+    loaded from model_dir without touching the network. The plain
+    pytorch backend falls back to the hub when nothing was exported.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend {backend!r}, expected one of {BACKENDS}")
+
+    path = local_path(model_id, backend, model_dir)
+    if not os.path.isdir(path):
+        if backend == "pytorch":
+            return pipeline("sentiment-analysis", model=model_id)
+        raise FileNotFoundError(
+            f"No {backend} files for {model_id} in {path}; "
+            f"run `python model_backends.py export --backend {backend}` first"
+        )
+
+    tokenizer = AutoTokenizer.from_pretrained(path, local_files_only=True)
+    if backend in ("pytorch", "int8"):
+        model = AutoModelForSequenceClassification.from_pretrained(path, local_files_only=True)
+        if backend == "int8":
+            import torch
+            model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    else:
+        from optimum.onnxruntime import ORTModelForSequenceClassification
+        file_name = "model_quantized.onnx" if backend == "onnx-int8" else "model.onnx"
+        model = ORTModelForSequenceClassification.from_pretrained(
+            path, file_name=file_name, local_files_only=True
+        )
+    return pipeline("sentiment-analysis", model=model, tokenizer=tokenizer)
+
+
+# ----
+# 5) Accuracy parity and latency
+# ----
+def parity_check(texts: list, model_id: str, backend: str, model_dir=MODEL_DIR,
+                 batch_size=32, max_chars=512) -> dict:
+    """
+    Score the same reviews with fp32 PyTorch and with `backend`, and
+    report label agreement, mean score difference and per-review latency.
+    """
+    texts = [t[:max_chars] for t in texts]
+    runs = {}
+    for name in ("pytorch", backend):
+        pipe = load_pipeline(model_id, name, model_dir)
+        pipe(texts[:batch_size], batch_size=batch_size, truncation=True)  # warm-up
+        start = time.perf_counter()
+        runs[name] = pipe(texts, batch_size=batch_size, truncation=True)
+        runs[name + "_ms"] = 1000 * (time.perf_counter() - start) / max(len(texts), 1)
+
+    reference, candidate = runs["pytorch"], runs[backend]
+    agree = sum(a["label"] == b["label"] for a, b in zip(reference, candidate))
+    return {
+        "model": model_id,
+        "backend": backend,
+        "reviews": len(texts),
+        "label_agreement": agree / max(len(texts), 1),
+        "mean_score_diff": sum(abs(a["score"] - b["score"]) for a, b in zip(reference, candidate))
+                           / max(len(texts), 1),
+        "fp32_ms_per_review": runs["pytorch_ms"],
+        "backend_ms_per_review": runs[backend + "_ms"],
+    }
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Export stage 03 models or check backend parity.")
+    arg_parser.add_argument("command", choices=["export", "parity"])
+    arg_parser.add_argument("--backend", choices=BACKENDS, default="onnx-int8")
+    arg_parser.add_argument("--model-dir", default=MODEL_DIR)
+    arg_parser.add_argument("--sample", type=int, default=500, help="reviews sampled for parity")
+    args = arg_parser.parse_args()
+
+    if args.command == "export":
+        for model_id in MODELS:
+            # The fp32 copy is also the parity reference
+            for backend in dict.fromkeys(["pytorch", args.backend]):
+                print(f"Exported {model_id} ({backend}) to {export_model(model_id, backend, args.model_dir)}")
+    else:
+        import storage
+        content = storage.load_table(storage.FUZZY, columns=["content"])["content"].dropna()
+        texts = list(content.astype(str))
+        random.Random(42).shuffle(texts)
+        for model_id in MODELS:
+            result = parity_check(texts[:args.sample], model_id, args.backend, args.model_dir)
+            print(f"{model_id} [{result['backend']}]: {result['label_agreement']:.1%} labels agree, "
+                  f"mean |score diff| {result['mean_score_diff']:.4f}, "
+                  f"{result['fp32_ms_per_review']:.1f} -> {result['backend_ms_per_review']:.1f} ms/review")
@@ -0,0 +1,294 @@
+# near_duplicates.py
+#
+# MinHash / LSH near-duplicate detection over review text, used by
+# 01b_Remove_Near_Duplicates.py. Reviews are reduced to sets of word
+# shingles, each set to a MinHash signature, and signatures are banded into
+# an on-disk LSH index. A new review is only compared with the reviews that
+# share a band bucket with it, so adding n reviews costs about O(n) no
+# matter how large the index already is.
+#
+#   python near_duplicates.py                # largest near-duplicate clusters
+
+# ----
+# 1) Imports
+# ----
+import argparse
+import re
+import sqlite3
+import zlib
+
+import numpy as np
+
+# ----
+# 2) Defaults
+# ----
+INDEX_FILE = "near_duplicates.sqlite"
+SHINGLE_SIZE = 3         # words per shingle
+MIN_SHINGLES = 8         # shorter reviews ("Excellent", "No content") are never clustered
+NUM_PERM = 128           # MinHash values per review
+BANDS = 16               # LSH bands of NUM_PERM // BANDS rows each
+THRESHOLD = 0.8          # estimated Jaccard similarity that counts as a duplicate
+SEED = 1
+BATCH_SIZE = 10_000      # reviews hashed and indexed per SQLite transaction
+MAX_CELLS = 8_000_000    # shingles x permutations hashed per numpy call
+MAX_BUCKET = 20          # earlier reviews per bucket compared within a batch
+
+_WORD = re.compile(r"\w+")
+_MIX = np.uint64(0x9E3779B97F4A7C15)
+_EMPTY = np.iinfo(np.uint32).max
+
+
+# ----
+# 3) Shingles and signatures
+# ----
+def shingle_hashes(text: str, k=SHINGLE_SIZE) -> np.ndarray:
+    """Distinct 64-bit hashes of the text's k-word shingles (fewer words: one shingle)."""
+    words = _WORD.findall(text.lower()) if isinstance(text, str) else []
+    if not words:
+        return np.empty(0, dtype=np.uint64)
+    ids = np.fromiter((zlib.crc32(w.encode("utf-8")) for w in words), dtype=np.uint64, count=len(words))
+    k = min(k, len(ids))
+    n = len(ids) - k + 1
+    hashes = ids[:n].copy()
+    for j in range(1, k):
+        hashes = hashes * _MIX + ids[j:n + j]  # wraps around, which is what we want
+    return np.unique(hashes)
+
+
+def permutations(num_perm=NUM_PERM, seed=SEED):
+    """Multipliers (odd) and offsets of the multiply-shift hash family."""
+    rng = np.random.default_rng(seed)
+    top = np.iinfo(np.uint64).max
+    a = rng.integers(1, top, size=num_perm, dtype=np.uint64, endpoint=True) | np.uint64(1)
+    b = rng.integers(0, top, size=num_perm, dtype=np.uint64, endpoint=True)
+    return a, b
+
+
+def minhash_signatures(texts, num_perm=NUM_PERM, seed=SEED, k=SHINGLE_SIZE,
+                       min_shingles=MIN_SHINGLES) -> np.ndarray:
+    """
+    (len(texts), num_perm) uint32 MinHash signatures. Texts with fewer than
+    min_shingles distinct shingles are too short for the estimate to mean
+    anything and get an all-max signature; has_shingles() tells them apart.
+    Shingles of many texts are hashed together in bounded numpy blocks.
+    """
+    a, b = permutations(num_perm, seed)
+    shingles = [shingle_hashes(t, k) for t in texts]
+    shingles = [x if len(x) >= max(min_shingles, 1) else x[:0] for x in shingles]
+    signatures = np.full((len(shingles), num_perm), _EMPTY, dtype=np.uint32)
+    budget = max(1, MAX_CELLS // num_perm)
+
+    start = 0
+    while start < len(shingles):
+        end, cells = start, 0
+        while end < len(shingles) and (end == start or cells + len(shingles[end]) <= budget):
+            cells += len(shingles[end])
+            end += 1
+        rows = [i for i in range(start, end) if len(shingles[i])]
+        if rows:
+            x = np.concatenate([shingles[i] for i in rows])
+            offsets = np.cumsum([0] + [len(shingles[i]) for i in rows[:-1]])
+            hashed = ((a[:, None] * x[None, :] + b[:, None]) >> np.uint64(32)).astype(np.uint32)
+            signatures[rows] = np.minimum.reduceat(hashed, offsets, axis=1).T
+        start = end
+    return signatures
+
+
+def has_shingles(signatures: np.ndarray) -> np.ndarray:
+    return (signatures != _EMPTY).any(axis=1)
+
+
+def band_keys(signatures: np.ndarray, bands=BANDS) -> np.ndarray:
+    """(n, bands) int64 bucket keys, one hash per band of signature rows."""
+    rows = signatures.shape[1] // bands
+    keys = np.zeros((len(signatures), bands), dtype=np.uint64)
+    for r in range(rows):
+        keys = keys * _MIX + signatures[:, r::rows][:, :bands].astype(np.uint64)
+    return keys.view(np.int64)
+
+
+def similarity(a: np.ndarray, b: np.ndarray) -> float:
+    """Estimated Jaccard similarity of two signatures."""
+    return float(np.mean(a == b))
+
+
+# ----
+# 4) Persistent LSH index
+# ----
+class NearDuplicateIndex:
+    """
+    Review key -> near-duplicate cluster, persisted to SQLite. Only the
+    first review of each cluster (its canonical review) is put into the
+    LSH buckets, so buckets stay small however many copies arrive.
+    Reviews with fewer than `min_shingles` shingles are indexed as their
+    own cluster and never matched in either direction.
+
+    add() is incremental: reviews already in the index are looked up,
+    new ones are hashed and matched against the canonical reviews
+    (earlier batches and earlier rows of the same batch).
+    """
+
+    def __init__(self, path=INDEX_FILE, num_perm=NUM_PERM, bands=BANDS, threshold=THRESHOLD,
+                 shingle_size=SHINGLE_SIZE, min_shingles=MIN_SHINGLES, seed=SEED):
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be a multiple of bands ({bands})")
+        self.path = path
+        self.num_perm = num_perm
+        self.bands = bands
+        self.threshold = threshold
+        self.shingle_size = shingle_size
+        self.min_shingles = min_shingles
+        self.seed = seed
+
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT);
+            CREATE TABLE IF NOT EXISTS docs (
+                doc INTEGER PRIMARY KEY, review_key TEXT UNIQUE,
+                cluster INTEGER, similarity REAL, signature BLOB
+            );
+            CREATE TABLE IF NOT EXISTS buckets (
+                band INTEGER, key INTEGER, doc INTEGER, PRIMARY KEY (band, key, doc)
+            ) WITHOUT ROWID;
+            CREATE TEMP TABLE batch_keys (pos INTEGER, review_key TEXT);
+            CREATE TEMP TABLE batch_bands (pos INTEGER, band INTEGER, key INTEGER);
+        """)
+        # Signatures from different settings cannot be compared
+        params = {"num_perm": num_perm, "bands": bands, "shingle_size": shingle_size,
+                  "min_shingles": min_shingles, "seed": seed}
+        stored = dict(self.conn.execute("SELECT name, value FROM meta"))
+        if stored and stored != {k: str(v) for k, v in params.items()}:
+            raise ValueError(f"{path} was built with {stored}; delete it to rebuild with {params}")
+        self.conn.executemany("INSERT OR IGNORE INTO meta VALUES (?, ?)",
+                              [(k, str(v)) for k, v in params.items()])
+        self.conn.commit()
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM docs").fetchone()[0]
+
+    def add(self, keys, texts, batch_size=BATCH_SIZE) -> list:
+        """
+        Index reviews and return, for each one, the review key of the
+        canonical review of its cluster (its own key if it is not a near
+        duplicate of anything indexed before it).
+        """
+        keys, texts = list(keys), list(texts)
+        clusters = []
+        for start in range(0, len(keys), batch_size):
+            clusters.extend(self._add_batch(keys[start:start + batch_size], texts[start:start + batch_size]))
+        return clusters
+
+    def _add_batch(self, keys, texts) -> list:
+        cur = self.conn.cursor()
+        cur.execute("DELETE FROM batch_keys")
+        cur.executemany("INSERT INTO batch_keys VALUES (?, ?)", enumerate(keys))
+        known = dict(cur.execute("""
+            SELECT k.pos, c.review_key FROM batch_keys k
+            JOIN docs d ON d.review_key = k.review_key
+            JOIN docs c ON c.doc = d.cluster
+        """))
+
+        # First occurrence of each unseen key
+        new_pos, first = [], {}
+        for pos, key in enumerate(keys):
+            if pos not in known and key not in first:
+                first[key] = pos
+                new_pos.append(pos)
+
+        result = [known.get(pos) for pos in range(len(keys))]
+        if new_pos:
+            self._index_new(cur, [keys[p] for p in new_pos], [texts[p] for p in new_pos], new_pos, result)
+        # Repeats of a key within the batch share its cluster
+        for pos, key in enumerate(keys):
+            if result[pos] is None:
+                result[pos] = result[first[key]]
+        self.conn.commit()
+        return result
+
+    def _index_new(self, cur, keys, texts, positions, result):
+        signatures = minhash_signatures(texts, self.num_perm, self.seed, self.shingle_size, self.min_shingles)
+        bands = band_keys(signatures, self.bands)
+        usable = has_shingles(signatures)
+        n = len(keys)
+
+        # Candidates among canonical reviews already in the index
+        cur.execute("DELETE FROM batch_bands")
+        cur.executemany("INSERT INTO batch_bands VALUES (?, ?, ?)", (
+            (i, band, int(bands[i, band])) for i in np.flatnonzero(usable).tolist() for band in range(self.bands)
+        ))
+        best = {}  # i -> (similarity, doc)
+        for i, doc, blob in cur.execute("""
+            SELECT DISTINCT t.pos, d.doc, d.signature FROM batch_bands t
+            JOIN buckets b ON b.band = t.band AND b.key = t.key
+            JOIN docs d ON d.doc = b.doc
+        """):
+            sim = similarity(signatures[i], np.frombuffer(blob, dtype=np.uint32))
+            if sim >= self.threshold and (i not in best or (sim, -doc) > (best[i][0], -best[i][1])):
+                best[i] = (sim, doc)
+        cluster_keys = dict(cur.execute(
+            f"SELECT doc, review_key FROM docs WHERE doc IN ({','.join('?' * len(best))})",
+            [doc for _, doc in best.values()],
+        )) if best else {}
+
+        # Candidates among earlier rows of this batch
+        earlier = [[] for _ in range(n)]
+        for band in range(self.bands):
+            order = np.argsort(bands[:, band], kind="stable")
+            sorted_keys = bands[order, band]
+            bounds = np.flatnonzero(np.diff(sorted_keys)) + 1
+            for group in np.split(order, bounds):
+                group = [i for i in group.tolist() if usable[i]]
+                for j in range(1, len(group)):
+                    earlier[group[j]].extend(group[:min(j, MAX_BUCKET)])
+
+        next_doc = (cur.execute("SELECT MAX(doc) FROM docs").fetchone()[0] or 0) + 1
+        doc_ids = list(range(next_doc, next_doc + n))
+        cluster = [None] * n
+        docs, buckets = [], []
+        for i in range(n):
+            sim = None
+            if i in best:
+                sim, cluster[i] = best[i]
+                result[positions[i]] = cluster_keys[cluster[i]]
+            else:
+                for j in dict.fromkeys(earlier[i]):
+                    if cluster[j] == doc_ids[j]:
+                        s = similarity(signatures[i], signatures[j])
+                        if s >= self.threshold:
+                            sim, cluster[i] = s, doc_ids[j]
+                            result[positions[i]] = keys[j]
+                            break
+            if cluster[i] is None:
+                cluster[i] = doc_ids[i]
+                result[positions[i]] = keys[i]
+                if usable[i]:
+                    buckets.extend((band, int(bands[i, band]), doc_ids[i]) for band in range(self.bands))
+            canonical = cluster[i] == doc_ids[i]
+            docs.append((doc_ids[i], keys[i], cluster[i], sim,
+                         signatures[i].tobytes() if canonical else None))
+
+        cur.executemany("INSERT INTO docs VALUES (?, ?, ?, ?, ?)", docs)
+        cur.executemany("INSERT INTO buckets VALUES (?, ?, ?)", buckets)
+
+    def largest_clusters(self, n=10) -> list:
+        """[(canonical review key, cluster size)] for the n largest clusters."""
+        return list(self.conn.execute("""
+            SELECT c.review_key, COUNT(*) AS size FROM docs d JOIN docs c ON c.doc = d.cluster
+            GROUP BY d.cluster HAVING size > 1 ORDER BY size DESC LIMIT ?
+        """, (n,)))
+
+    def close(self):
+        self.conn.close()
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Show the largest near-duplicate clusters.")
+    arg_parser.add_argument("--index", default=INDEX_FILE)
+    arg_parser.add_argument("-n", type=int, default=10)
+    args = arg_parser.parse_args()
+
+    index = NearDuplicateIndex(args.index)
+    print(f"{len(index)} reviews indexed")
+    for key, size in index.largest_clusters(args.n):
+        print(f"{size:>6}  {key}")
+    index.close()
@@ -0,0 +1,245 @@
+# page_archive.py
+#
+# Compressed, append-only archive of every page the scraper fetches, so
+# reviews can be re-extracted offline (no browser, no network) after a
+# selector change or when a new field is added.
+#
+#   python page_archive.py stats
+#   python page_archive.py show 12                  # latest copy of page 12
+#   python page_archive.py extract --workers 8      # re-parse everything
+#
+# Pages are stored as independent gzip members appended to page_archive.gz
+# (so `zcat page_archive.gz` still works); page_archive.sqlite records each
+# page's URL, fetch time, byte offset and length for random access.
+
+# ----
+# 1) Imports
+# ----
+import argparse
+import gzip
+import hashlib
+import os
+import sqlite3
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import pandas as pd
+
+import storage
+from review_index import review_key
+from review_parser import parse_page
+
+# ----
+# 2) Defaults
+# ----
+ARCHIVE_FILE = "page_archive.gz"
+INDEX_FILE = "page_archive.sqlite"
+COMPRESSLEVEL = 6
+PAGES_PER_TASK = 25          # pages handed to a worker at a time
+REEXTRACTED = "raw_ba_reviews_reextracted"
+
+
+# ----
+# 3) Archive
+# ----
+class PageArchive:
+    """
+    Append-only page store. add() writes the compressed page first and
+    only then records its offset, so a crash can leave unreferenced bytes
+    at the end of the archive but never an index entry without its page.
+    A page identical to the latest stored copy of the same URL is not
+    written again.
+    """
+
+    def __init__(self, path=ARCHIVE_FILE, index=INDEX_FILE):
+        self.path = path
+        self.conn = sqlite3.connect(index)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS pages (
+                id INTEGER PRIMARY KEY, url TEXT, page INTEGER, fetched_at TEXT,
+                offset INTEGER, length INTEGER, size INTEGER, sha1 TEXT
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS pages_url ON pages (url, id)")
+        self.conn.commit()
+        self._file = None
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+
+    def add(self, url: str, html: str, page: int = None) -> int:
+        """Archive one fetched page; returns its entry id."""
+        data = html.encode("utf-8")
+        sha1 = hashlib.sha1(data).hexdigest()
+        latest = self.conn.execute(
+            "SELECT id, sha1 FROM pages WHERE url = ? ORDER BY id DESC LIMIT 1", (url,)
+        ).fetchone()
+        if latest and latest[1] == sha1:
+            return latest[0]
+
+        if self._file is None:
+            self._file = open(self.path, "ab")
+        record = gzip.compress(data, compresslevel=COMPRESSLEVEL, mtime=0)
+        offset = self._file.seek(0, os.SEEK_END)
+        self._file.write(record)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+        cur = self.conn.execute(
+            "INSERT INTO pages (url, page, fetched_at, offset, length, size, sha1) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (url, page, datetime.now().isoformat(timespec="seconds"), offset, len(record), len(data), sha1),
+        )
+        self.conn.commit()
+        return cur.lastrowid
+
+    def entries(self, latest_only=False) -> list:
+        """[(id, url, page, offset, length)] in the order pages were archived."""
+        query = "SELECT id, url, page, offset, length FROM pages"
+        if latest_only:
+            query += " WHERE id IN (SELECT MAX(id) FROM pages GROUP BY url)"
+        return self.conn.execute(query + " ORDER BY id").fetchall()
+
+    def get(self, entry_id: int) -> str:
+        """HTML of one archived page, read straight from its offset."""
+        row = self.conn.execute("SELECT offset, length FROM pages WHERE id = ?", (entry_id,)).fetchone()
+        if row is None:
+            raise KeyError(entry_id)
+        with open(self.path, "rb") as f:
+            return read_page(f, *row)
+
+    def latest(self, page: int) -> str:
+        """Most recently archived copy of a listing page number."""
+        row = self.conn.execute(
+            "SELECT id FROM pages WHERE page = ? ORDER BY id DESC LIMIT 1", (page,)
+        ).fetchone()
+        if row is None:
+            raise KeyError(page)
+        return self.get(row[0])
+
+    def stats(self) -> dict:
+        pages, urls, stored, raw = self.conn.execute(
+            "SELECT COUNT(*), COUNT(DISTINCT url), COALESCE(SUM(length), 0), COALESCE(SUM(size), 0) FROM pages"
+        ).fetchone()
+        return {"pages": pages, "urls": urls, "archive_mb": stored / 2**20, "html_mb": raw / 2**20,
+                "compression_ratio": raw / stored if stored else None}
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self.conn.close()
+
+
+def read_page(f, offset: int, length: int) -> str:
+    f.seek(offset)
+    return gzip.decompress(f.read(length)).decode("utf-8", errors="replace")
+
+
+# ----
+# 4) Parallel offline re-extraction
+# ----
+_worker_file = None
+
+
+def _init_worker(path):
+    global _worker_file
+    _worker_file = open(path, "rb")
+
+
+def _extract(entries: list) -> list:
+    """[(entry id, reviews or None, error or None)] for a slice of the archive."""
+    out = []
+    for entry_id, offset, length in entries:
+        try:
+            out.append((entry_id, parse_page(read_page(_worker_file, offset, length)), None))
+        except Exception as e:
+            out.append((entry_id, None, repr(e)))
+    return out
+
+
+def reextract(archive: PageArchive, workers=None, pages_per_task=PAGES_PER_TASK) -> tuple:
+    """
+    Re-parse every archived page across `workers` processes and return
+    (reviews DataFrame, [(failed entry id, error)], [entry ids with no review
+    cards]). Pages are read in archive order and each review is kept once,
+    at its first appearance, the way incremental scraping builds the raw
+    table. Must run under a `__main__` guard.
+    """
+    entries = [(entry_id, offset, length) for entry_id, _, _, offset, length in archive.entries()]
+    tasks = [entries[i:i + pages_per_task] for i in range(0, len(entries), pages_per_task)]
+    workers = workers or os.cpu_count() or 1
+
+    reviews, seen, failed, cardless = [], set(), [], []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(archive.path,)) as pool:
+        # map() yields task results in archive order
+        for results in pool.map(_extract, tasks):
+            for entry_id, page_reviews, error in results:
+                if error is not None:
+                    failed.append((entry_id, error))
+                    continue
+                if not page_reviews:
+                    cardless.append(entry_id)
+                for review in page_reviews:
+                    key = review_key(review)
+                    if key not in seen:
+                        seen.add(key)
+                        reviews.append(review)
+
+    df = pd.DataFrame(reviews, columns=["date", "author", "place", "content", "overall_rating", "verified"])
+    # Same finishing steps as the scraper
+    df["overall_rating"] = df["overall_rating"].astype(int)
+    df.fillna("Not specified", inplace=True)
+    return df, failed, cardless
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Inspect the page archive or re-extract reviews from it.")
+    arg_parser.add_argument("--archive", default=ARCHIVE_FILE)
+    arg_parser.add_argument("--index", default=INDEX_FILE)
+    commands = arg_parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("stats", help="page count and archive size")
+    show = commands.add_parser("show", help="print the latest archived HTML of a page number")
+    show.add_argument("page", type=int)
+    extract = commands.add_parser("extract", help="re-parse every archived page in parallel")
+    extract.add_argument("--workers", type=int, default=None)
+    extract.add_argument("--table", default=REEXTRACTED,
+                         help=f"output table (default {REEXTRACTED}; use {storage.RAW} to replace the raw table)")
+    extract.add_argument("--force", action="store_true",
+                         help=f"replace {storage.RAW} even with fewer reviews than it holds now")
+    args = arg_parser.parse_args()
+
+    archive = PageArchive(args.archive, args.index)
+    if args.command == "stats":
+        for name, value in archive.stats().items():
+            print(f"{name}: {value}")
+    elif args.command == "show":
+        print(archive.latest(args.page))
+    else:
+        start = time.perf_counter()
+        df, failed, cardless = reextract(archive, args.workers)
+        print(f"Re-extracted {len(df)} reviews from {len(archive)} archived pages "
+              f"in {time.perf_counter() - start:.1f}s")
+        for entry_id, error in failed:
+            print(f"  entry {entry_id} failed: {error}")
+        if cardless:
+            # The page past the end of the listing is archived too, so one is expected
+            print(f"  warning: {len(cardless)} archived pages have no review cards "
+                  f"(entries {', '.join(map(str, cardless[:10]))}{', ...' if len(cardless) > 10 else ''}); "
+                  f"check the selectors in review_parser.py")
+        archive.close()
+
+        current = storage.count_rows(args.table) if args.table == storage.RAW and storage.exists(args.table) else 0
+        if df.empty:
+            print("No reviews extracted; nothing written.")
+            sys.exit(1)
+        if len(df) < current and not args.force:
+            print(f"Refusing to replace {storage.RAW} ({current} reviews) with {len(df)} reviews; "
+                  f"write to another --table to compare, or pass --force.")
+            sys.exit(1)
+        storage.save_table(df, args.table)
+        print(f"-> {storage.parquet_path(args.table)}")
+        sys.exit(1 if failed else 0)
+    archive.close()
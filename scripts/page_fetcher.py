@@ -0,0 +1,174 @@
+# page_fetcher.py
+#
+# Concurrent HTTP page fetcher used by 01_Scrape_BA_Reviews.py
+
+# ----
+# 1) Imports
+# ----
+import asyncio
+import random
+from urllib.parse import urlsplit
+
+import aiohttp
+
+import instrumentation
+
+# ----
+# 2) Defaults
+# ----
+USER_AGENT = (
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
+    '(KHTML, like Gecko) Chrome/120.0.6099.216 Safari/537.36'
+)
+N_SESSIONS = 4
+INTERVAL = 2.0      # seconds between request starts to the same host
+JITTER = 1.0        # extra random delay added to INTERVAL
+RETRIES = 4
+BACKOFF = 2.0       # first retry delay, doubled on every further attempt
+TIMEOUT = 30
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class FetchError(Exception):
+    """A page kept failing after every retry."""
+
+
+# ----
+# 3) Per-host rate limiter
+# ----
+class HostRateLimiter:
+    """
+    Spaces out request starts to each host by `interval` seconds plus a
+    random jitter, no matter how many sessions are sharing the host.
+    """
+
+    def __init__(self, interval=INTERVAL, jitter=JITTER):
+        self.interval = interval
+        self.jitter = jitter
+        self._next_start = {}
+        self._lock = None
+
+    async def wait(self, url: str):
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        loop = asyncio.get_running_loop()
+        host = urlsplit(url).netloc
+        async with self._lock:
+            now = loop.time()
+            start = max(now, self._next_start.get(host, now))
+            self._next_start[host] = start + self.interval + random.uniform(0, self.jitter)
+        await asyncio.sleep(start - now)
+
+
+# ----
+# 4) Fetcher
+# ----
+class PageFetcher:
+    """
+    Fetches numbered review pages (`{base_url}?page=N`) over a pool of
+    HTTP sessions pulling from one shared work queue.
+
+    A 404 marks the end of the listing. `is_end(page, html)` may also
+    decide a fetched page is past the end; either way pages from there
+    on are dropped and no longer requested. Failing pages are retried
+    with exponential backoff and reported in `failed` if they never
+    succeed.
+    """
+
+    def __init__(self, base_url, n_sessions=N_SESSIONS, interval=INTERVAL, jitter=JITTER,
+                 retries=RETRIES, backoff=BACKOFF, timeout=TIMEOUT, headers=None, log=None):
+        self.base_url = base_url
+        self.n_sessions = n_sessions
+        self.limiter = HostRateLimiter(interval, jitter)
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.headers = {"User-Agent": USER_AGENT, **(headers or {})}
+        self.log = log or (lambda message: None)
+        self.end_page = None
+        self.failed = {}
+
+    def page_url(self, page: int) -> str:
+        return f"{self.base_url}?page={page}"
+
+    def fetch(self, pages, is_end=None) -> dict:
+        """Fetch pages and return {page: html} in page order."""
+        return asyncio.run(self.fetch_async(pages, is_end))
+
+    async def fetch_async(self, pages, is_end=None) -> dict:
+        self.end_page = None
+        self.failed = {}
+        queue = asyncio.Queue()
+        for page in pages:
+            queue.put_nowait(page)
+
+        results = {}
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+        sessions = [aiohttp.ClientSession(headers=self.headers, timeout=timeout)
+                    for _ in range(self.n_sessions)]
+        try:
+            await asyncio.gather(*(self._worker(s, queue, results, is_end) for s in sessions))
+        finally:
+            for session in sessions:
+                await session.close()
+
+        return {page: results[page] for page in sorted(results) if not self._past_end(page)}
+
+    def _past_end(self, page):
+        return self.end_page is not None and page >= self.end_page
+
+    def _mark_end(self, page):
+        if self.end_page is None or page < self.end_page:
+            self.log(f"Page {page} is past the last page, stopping.")
+            self.end_page = page
+
+    async def _worker(self, session, queue, results, is_end):
+        while True:
+            try:
+                page = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            if self._past_end(page):
+                continue
+            try:
+                html = await self._fetch_page(session, page)
+            except FetchError as e:
+                self.failed[page] = str(e)
+                self.log(f"Giving up on page {page}: {e}")
+                continue
+            if html is None or (is_end and is_end(page, html)):
+                self._mark_end(page)
+                continue
+            results[page] = html
+
+    async def _fetch_page(self, session, page):
+        """Return the page's HTML, or None if the page does not exist."""
+        url = self.page_url(page)
+        for attempt in range(self.retries + 1):
+            with instrumentation.timer("scrape.rate_wait"):
+                await self.limiter.wait(url)
+            retry_after = None
+            try:
+                with instrumentation.timer("scrape.fetch", page=page, attempt=attempt):
+                    async with session.get(url) as resp:
+                        if resp.status == 404:
+                            return None
+                        if resp.status in RETRY_STATUSES:
+                            retry_after = resp.headers.get("Retry-After")
+                            error = f"HTTP {resp.status}"
+                        elif resp.status >= 400:
+                            raise FetchError(f"HTTP {resp.status}")
+                        else:
+                            self.log(f"Fetched page {page}")
+                            return await resp.text()
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                error = repr(e)
+            instrumentation.count("scrape.retries")
+
+            if attempt == self.retries:
+                raise FetchError(error)
+            delay = self.backoff * 2 ** attempt + random.uniform(0, self.backoff)
+            if retry_after and retry_after.isdigit():
+                delay = max(delay, int(retry_after))
+            self.log(f"Page {page} attempt {attempt + 1} failed ({error}), retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
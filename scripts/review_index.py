@@ -0,0 +1,75 @@
+# review_index.py
+#
+# Persistent index of already-scraped reviews, used by the incremental
+# mode of 01_Scrape_BA_Reviews.py
+
+# ----
+# 1) Imports
+# ----
+import hashlib
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+# ----
+# 2) Defaults
+# ----
+INDEX_FILE = "review_index.sqlite"
+
+
+def review_key(review: dict) -> str:
+    """Stable hash of a review's author, date and content."""
+    parts = (str(review["author"]), str(review["date"]), str(review["content"]))
+    return hashlib.sha1("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
+def review_hashes(df: pd.DataFrame) -> np.ndarray:
+    """
+    Vectorized 64-bit hashes of (content, author, date), as signed ints
+    for SQLite. Dates are compared as timestamps, so the raw string and
+    the cleaned datetime column hash alike.
+    """
+    keys = pd.DataFrame({
+        "content": df["content"].astype(str),
+        "author": df["author"].astype(str),
+        "date": pd.to_datetime(df["date"], errors="coerce").astype("datetime64[ns]"),
+    })
+    return pd.util.hash_pandas_object(keys, index=False).to_numpy().view(np.int64)
+
+
+# ----
+# 3) Index
+# ----
+class ReviewIndex:
+    """
+    Set of review keys kept in memory and persisted to SQLite.
+    Keys are only written by add_many(), so callers can hold off until
+    the matching rows are safely on disk.
+    """
+
+    def __init__(self, path=INDEX_FILE):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS reviews (review_key TEXT PRIMARY KEY)")
+        self.conn.commit()
+        self.keys = {k for (k,) in self.conn.execute("SELECT review_key FROM reviews")}
+
+    def __contains__(self, key):
+        return key in self.keys
+
+    def __len__(self):
+        return len(self.keys)
+
+    def add_many(self, keys):
+        new = [k for k in set(keys) if k not in self.keys]
+        self.conn.executemany("INSERT OR IGNORE INTO reviews (review_key) VALUES (?)", [(k,) for k in new])
+        self.conn.commit()
+        self.keys.update(new)
+
+    def seed_from_reviews(self, reviews):
+        """Index existing review dicts (e.g. rows of a previously saved CSV)."""
+        self.add_many(review_key(r) for r in reviews)
+
+    def close(self):
+        self.conn.close()
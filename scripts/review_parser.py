@@ -0,0 +1,323 @@
+# review_parser.py
+#
+# Review-card extraction for Trustpilot pages. Works on HTML strings alone,
+# so saved pages can be re-parsed offline in bulk.
+#
+#   python review_parser.py saved_pages/   # benchmark + parity check
+
+# ----
+# 1) Imports
+# ----
+import argparse
+import gzip
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+from bs4 import BeautifulSoup
+from lxml import etree
+
+
+def _no_log(message):
+    pass
+
+
+# ----
+# 2) Precompiled selectors
+# ----
+def _has_class(cls: str) -> str:
+    """XPath test mirroring BeautifulSoup's class_= matching."""
+    if " " in cls:
+        # A multi-class string must equal the whole class attribute
+        return f"normalize-space(@class)='{cls}'"
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {cls} ')"
+
+
+REVIEW_CARD_CLASS = 'styles_reviewCardInner__UZk1x'
+
+_REVIEW_CARDS = etree.XPath(f"//div[{_has_class(REVIEW_CARD_CLASS)}]")
+_DATE = etree.XPath(
+    f".//p[{_has_class('typography_body-m__k2UI7 typography_appearance-default__t8iAq')}]"
+    "[@data-service-review-date-of-experience-typography='true']"
+)
+_TIME = etree.XPath(f".//time[{_has_class('data-service-review-date-time-ago')}]")
+_AUTHOR = etree.XPath(
+    f".//span[{_has_class('typography_heading-xxs__UmE9o typography_appearance-default__t8iAq')}]"
+)
+_AUTHOR_LINK = etree.XPath(
+    f".//a[{_has_class('link_internal__Eam_b link_wrapper__ahpyq styles_consumerDetails__DW9Hp')}]"
+)
+_AUTHOR_LINK_SPAN = etree.XPath(f".//span[{_has_class('typography_heading-xxs__UmE9o')}]")
+_PLACE = etree.XPath(
+    f".//div[{_has_class('typography_body-m__k2UI7 typography_appearance-subtle__PYOVM styles_detailsIcon__ch_FY')}]"
+)
+_SPAN = etree.XPath(".//span")
+_CONTENT = etree.XPath(
+    f".//p[{_has_class('typography_body-l__v5JLj typography_appearance-default__t8iAq typography_color-black__wpn7m')}]"
+)
+_RATING = etree.XPath(f".//div[{_has_class('star-rating_starRating__sdbkn star-rating_medium__Oj7C9')}]")
+_STARS_IMG = etree.XPath(".//img[contains(translate(@alt, 'STAR', 'star'), 'star')]")
+_VERIFIED = etree.XPath(
+    f".//div[{_has_class('review-content-header__review-verified')}]"
+    f" | .//span[{_has_class('verified-badge')}]"
+)
+
+
+def _first(selector, elem):
+    found = selector(elem)
+    return found[0] if found else None
+
+
+def _text(elem) -> str:
+    # etree.HTML() gives plain elements, which have no text_content()
+    return "".join(elem.itertext()).strip()
+
+
+# ----
+# 3) Fast lxml extraction
+# ----
+def parse_page(page_source, log=None):
+    """Extract every review card from a page's HTML (lxml, precompiled XPath)."""
+    log = log or _no_log
+    reviews = []
+    if not page_source:
+        return reviews
+    root = etree.HTML(page_source)
+    if root is None:
+        return reviews
+
+    for review in _REVIEW_CARDS(root):
+        try:
+            # --- Date of experience ---
+            date_elem = _first(_DATE, review)
+            if date_elem is not None:
+                date_text = _text(date_elem)
+                if "Date of experience:" in date_text:
+                    date_str = date_text.replace("Date of experience:", "").strip()
+                else:
+                    date_str = date_text
+            else:
+                time_elem = _first(_TIME, review)
+                if time_elem is not None and time_elem.get('datetime') is not None:
+                    dt_str = time_elem.get('datetime').split('T')[0]
+                    date_str = datetime.strptime(dt_str, "%Y-%m-%d").strftime("%B %d, %Y")
+                else:
+                    date_str = "Not specified"
+
+            # --- Author name ---
+            author_elem = _first(_AUTHOR, review)
+            if author_elem is not None:
+                author = _text(author_elem)
+            else:
+                author_link = _first(_AUTHOR_LINK, review)
+                if author_link is not None:
+                    author_span = _first(_AUTHOR_LINK_SPAN, author_link)
+                    author = _text(author_span) if author_span is not None else "Unknown"
+                else:
+                    author = "Unknown"
+
+            # --- Location / place ---
+            place_elem = _first(_PLACE, review)
+            place_span = _first(_SPAN, place_elem) if place_elem is not None else None
+            place = _text(place_span) if place_span is not None else "Not specified"
+
+            # --- Review content ---
+            content_elem = _first(_CONTENT, review)
+            content = _text(content_elem) if content_elem is not None else "No content"
+
+            # --- Overall rating ---
+            rating_elem = _first(_RATING, review)
+            overall_rating = 0
+            if rating_elem is not None:
+                stars_img = _first(_STARS_IMG, rating_elem)
+                if stars_img is not None:
+                    # Missing src skips the review, as in the BeautifulSoup version
+                    src = stars_img.attrib['src']
+                    if 'stars-' in src:
+                        overall_rating = int(src.split('stars-')[-1].split('.svg')[0])
+
+            # --- Verified status ---
+            verified = "Verified" if _VERIFIED(review) else "Not Verified"
+
+            reviews.append({
+                "date": date_str,
+                "author": author,
+                "place": place,
+                "content": content,
+                "overall_rating": overall_rating,
+                "verified": verified
+            })
+
+        except Exception as e:
+            log(f"Error processing a review: {e}")
+            continue
+
+    return reviews
+
+
+# ----
+# 4) Reference BeautifulSoup extraction
+# ----
+def parse_page_bs4(page_source, log=None):
+    """
+    Reference BeautifulSoup extraction, exactly as the scraper has always
+    done it. Kept for parity checks against parse_page().
+    """
+    log = log or _no_log
+    reviews = []
+    soup = BeautifulSoup(page_source, 'html.parser')
+    review_containers = soup.find_all('div', class_='styles_reviewCardInner__UZk1x')
+
+    for review in review_containers:
+        try:
+            # --- Date of experience ---
+            date_elem = review.find(
+                'p',
+                class_='typography_body-m__k2UI7 typography_appearance-default__t8iAq',
+                attrs={'data-service-review-date-of-experience-typography': 'true'}
+            )
+            if date_elem:
+                date_text = date_elem.text.strip()
+                if "Date of experience:" in date_text:
+                    date_str = date_text.replace("Date of experience:", "").strip()
+                else:
+                    date_str = date_text
+            else:
+                time_elem = review.find('time', class_='data-service-review-date-time-ago')
+                if time_elem and 'datetime' in time_elem.attrs:
+                    dt_str = time_elem['datetime'].split('T')[0]
+                    date_str = datetime.strptime(dt_str, "%Y-%m-%d").strftime("%B %d, %Y")
+                else:
+                    date_str = "Not specified"
+
+            # --- Author name ---
+            author_elem = review.find('span', class_='typography_heading-xxs__UmE9o typography_appearance-default__t8iAq')
+            if author_elem:
+                author = author_elem.text.strip()
+            else:
+                author_link = review.find('a', class_='link_internal__Eam_b link_wrapper__ahpyq styles_consumerDetails__DW9Hp')
+                if author_link:
+                    author_span = author_link.find('span', class_='typography_heading-xxs__UmE9o')
+                    author = author_span.text.strip() if author_span else "Unknown"
+                else:
+                    author = "Unknown"
+
+            # --- Location / place ---
+            place_elem = review.find(
+                'div',
+                class_='typography_body-m__k2UI7 typography_appearance-subtle__PYOVM styles_detailsIcon__ch_FY'
+            )
+            if place_elem and place_elem.find('span'):
+                place = place_elem.find('span').text.strip()
+            else:
+                place = "Not specified"
+
+            # --- Review content ---
+            content_elem = review.find(
+                'p',
+                class_='typography_body-l__v5JLj typography_appearance-default__t8iAq typography_color-black__wpn7m'
+            )
+            content = content_elem.text.strip() if content_elem else "No content"
+
+            # --- Overall rating ---
+            rating_elem = review.find('div', class_='star-rating_starRating__sdbkn star-rating_medium__Oj7C9')
+            overall_rating = 0
+            if rating_elem:
+                stars_img = rating_elem.find('img', alt=lambda x: x and 'star' in x.lower())
+                if stars_img and 'stars-' in stars_img['src']:
+                    rating_str = stars_img['src'].split('stars-')[-1].split('.svg')[0]
+                    overall_rating = int(rating_str)
+
+            # --- Verified status ---
+            verified = "Not Verified"
+            if (review.find('div', class_='review-content-header__review-verified')
+                or review.find('span', class_='verified-badge')):
+                verified = "Verified"
+
+            # Collect data
+            reviews.append({
+                "date": date_str,
+                "author": author,
+                "place": place,
+                "content": content,
+                "overall_rating": overall_rating,
+                "verified": verified
+            })
+
+        except Exception as e:
+            log(f"Error processing a review: {e}")
+            continue
+
+    return reviews
+
+
+# ----
+# 5) Benchmark and parity check over saved pages
+# ----
+def load_corpus(directory) -> list:
+    """Read every saved page (*.html or *.html.gz) under directory."""
+    pages = []
+    for path in sorted(Path(directory).rglob("*.htm*")):
+        if path.suffix == ".gz":
+            html = gzip.decompress(path.read_bytes()).decode("utf-8", errors="replace")
+        else:
+            html = path.read_text(encoding="utf-8", errors="replace")
+        pages.append((str(path), html))
+    return pages
+
+
+def benchmark(pages: list, parser, repeat=3) -> dict:
+    """Best-of-`repeat` wall time for parsing the whole corpus."""
+    best = None
+    n_reviews = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        n_reviews = sum(len(parser(html)) for _, html in pages)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return {
+        "parser": parser.__name__,
+        "pages": len(pages),
+        "reviews": n_reviews,
+        "seconds": best,
+        "pages_per_second": len(pages) / best if best else float("inf"),
+    }
+
+
+def parity(pages: list) -> list:
+    """Differences between parse_page and parse_page_bs4, as readable strings."""
+    problems = []
+    for name, html in pages:
+        expected = parse_page_bs4(html)
+        got = parse_page(html)
+        if len(expected) != len(got):
+            problems.append(f"{name}: {len(expected)} reviews (bs4) vs {len(got)} (lxml)")
+            continue
+        for i, (a, b) in enumerate(zip(expected, got)):
+            for field in a:
+                if a[field] != b[field]:
+                    problems.append(f"{name} review {i} {field}: {a[field]!r} (bs4) vs {b[field]!r} (lxml)")
+    return problems
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Benchmark parse_page and check it against BeautifulSoup.")
+    arg_parser.add_argument("corpus", help="directory of saved Trustpilot pages (*.html / *.html.gz)")
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    args = arg_parser.parse_args()
+
+    corpus = load_corpus(args.corpus)
+    if not corpus:
+        sys.exit(f"No saved pages found in {args.corpus}")
+
+    for parser in (parse_page_bs4, parse_page):
+        result = benchmark(corpus, parser, args.repeat)
+        print(f"{result['parser']:>15}: {result['pages']} pages, {result['reviews']} reviews, "
+              f"{result['seconds']:.3f}s ({result['pages_per_second']:.1f} pages/s)")
+
+    mismatches = parity(corpus)
+    for line in mismatches:
+        print(line)
+    print(f"Parity: {'OK' if not mismatches else f'{len(mismatches)} differences'}")
+    sys.exit(1 if mismatches else 0)
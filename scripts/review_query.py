@@ -0,0 +1,270 @@
+# review_query.py
+#
+# Precomputed review aggregates for the questions in the README (worst
+# aircraft, business vs economy, most-complained routes, ...). Stage 05
+# folds each cleaned chunk into review_aggregates.sqlite as it is written;
+# queries read a handful of pre-summed rows instead of the cleaned table.
+#
+#   python review_query.py worst aircraft
+#   python review_query.py compare seat_type "Business Class" "Economy Class"
+#   python review_query.py complaints route -n 20
+#   python review_query.py trend aircraft "Boeing 777"
+#   python review_query.py rebuild           # refold the whole cleaned table
+#
+# Rows hold sums and counts rather than means, so adding reviews is a plain
+# addition and means are worked out at query time.
+
+# ----
+# 1) Imports
+# ----
+import argparse
+import sqlite3
+import time
+
+import numpy as np
+import pandas as pd
+
+import storage
+from review_index import review_hashes
+from route_lookup import UNKNOWN_ROUTE
+
+# ----
+# 2) Defaults
+# ----
+STORE_FILE = "review_aggregates.sqlite"
+ALL_MONTHS = "all"
+MIN_REVIEWS = 20          # smaller groups are left out of rankings
+
+# dimension -> cleaned column ("month" and "all" are derived)
+DIMENSIONS = {
+    "aircraft": "pred_aircraft",
+    "seat_type": "pred_seat_type",
+    "traveller_type": "pred_traveller_type",
+    "route": "route_city",
+    "month": None,
+    "all": None,
+}
+# Placeholders the earlier stages write in place of a missing value
+MISSING_KEYS = [UNKNOWN_ROUTE, "Not specified"]
+SUMS = ["reviews", "rating_sum", "rating_n", "pred_sum", "pred_n", "positive", "negative"]
+ORDERS = {
+    "reviews": "reviews DESC",
+    # Keys without a single rating sort last, not first
+    "worst": "mean_rating ASC NULLS LAST",
+    "best": "mean_rating DESC NULLS LAST",
+    "complaints": "complaints DESC",
+}
+
+
+# ----
+# 3) Aggregating a chunk
+# ----
+def aggregate(df: pd.DataFrame) -> list:
+    """
+    [(dimension, key, month, reviews, rating_sum, rating_n, pred_sum,
+    pred_n, positive, negative)] for a cleaned chunk: one row per key and
+    month plus one all-time row per key (month = ALL_MONTHS). Rows with
+    no value for a dimension, or only a MISSING_KEYS placeholder, are left
+    out of that dimension. An overall_rating of 0 is the scraper's "no
+    rating found" placeholder and counts as missing.
+    """
+    rating = pd.to_numeric(np.asarray(df["overall_rating"], dtype=object), errors="coerce")
+    rating = np.where(rating == 0, np.nan, rating)
+    pred = pd.to_numeric(df["pred_star_ratings"], errors="coerce")
+    sentiment = df["pred_sentiment"].astype(str) if "pred_sentiment" in df.columns else pd.Series("", index=df.index)
+    month = pd.to_datetime(df["date"], errors="coerce").dt.to_period("M")
+    values = pd.DataFrame({
+        "rating_sum": np.nan_to_num(rating).astype(np.float64),
+        "rating_n": ~np.isnan(rating),
+        "pred_sum": pred.fillna(0).to_numpy(dtype=np.float64),
+        "pred_n": pred.notna().to_numpy(),
+        "positive": (sentiment == "POSITIVE").to_numpy(),
+        "negative": (sentiment == "NEGATIVE").to_numpy(),
+        "month": month,
+    }, index=df.index)
+
+    rows = []
+    for dimension, column in DIMENSIONS.items():
+        if dimension == "month":
+            keyed = values.assign(key=month.astype(str).where(month.notna()))
+        elif dimension == "all":
+            keyed = values.assign(key="")
+        elif column in df.columns:
+            keyed = values.assign(key=df[column].where(~df[column].isin(MISSING_KEYS)))
+        else:
+            continue
+        groupings = [["key"]] if dimension == "month" else [["key"], ["key", "month"]]
+        for by in groupings:
+            sums = keyed.groupby(by, observed=True).agg(
+                reviews=("rating_n", "size"), rating_sum=("rating_sum", "sum"), rating_n=("rating_n", "sum"),
+                pred_sum=("pred_sum", "sum"), pred_n=("pred_n", "sum"),
+                positive=("positive", "sum"), negative=("negative", "sum"),
+            )
+            for index, row in zip(sums.index, sums.itertuples(index=False)):
+                key, period = (index, ALL_MONTHS) if len(by) == 1 else (index[0], str(index[1]))
+                rows.append((dimension, str(key), period, int(row.reviews), float(row.rating_sum),
+                             int(row.rating_n), float(row.pred_sum), int(row.pred_n),
+                             int(row.positive), int(row.negative)))
+    return rows
+
+
+# ----
+# 4) Store
+# ----
+class AggregateStore:
+    """
+    On-disk aggregates keyed by (dimension, key, month). add() folds in
+    only reviews it has not seen before (tracked by 64-bit hash), so stage
+    05 can pass every cleaned chunk on every run. Each add() is one
+    transaction.
+    """
+
+    def __init__(self, path=STORE_FILE):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS aggregates (
+                dimension TEXT, key TEXT, month TEXT,
+                reviews INTEGER, rating_sum REAL, rating_n INTEGER, pred_sum REAL, pred_n INTEGER,
+                positive INTEGER, negative INTEGER,
+                PRIMARY KEY (dimension, month, key)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS seen (hash INTEGER PRIMARY KEY);
+            CREATE TEMP TABLE batch_hashes (pos INTEGER, hash INTEGER);
+        """)
+        self.conn.commit()
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM seen").fetchone()[0]
+
+    def add(self, df: pd.DataFrame) -> int:
+        """Fold the unseen rows of a cleaned chunk in; returns how many were new."""
+        if df.empty:
+            return 0
+        hashes = review_hashes(df)
+        cur = self.conn.cursor()
+        cur.execute("DELETE FROM batch_hashes")
+        cur.executemany("INSERT INTO batch_hashes VALUES (?, ?)", enumerate(hashes.tolist()))
+        known = [pos for (pos,) in cur.execute(
+            "SELECT b.pos FROM batch_hashes b JOIN seen s ON s.hash = b.hash"
+        )]
+        new = ~pd.Series(hashes).duplicated().to_numpy()
+        new[known] = False
+        if not new.any():
+            self.conn.commit()
+            return 0
+
+        cur.executemany(
+            f"""INSERT INTO aggregates VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (dimension, month, key) DO UPDATE SET
+                {", ".join(f"{c} = {c} + excluded.{c}" for c in SUMS)}""",
+            aggregate(df[new]),
+        )
+        cur.executemany("INSERT INTO seen VALUES (?)", ((h,) for h in hashes[new].tolist()))
+        self.conn.commit()
+        return int(new.sum())
+
+    def clear(self):
+        self.conn.executescript("DELETE FROM aggregates; DELETE FROM seen;")
+        self.conn.commit()
+
+    # ----
+    # 5) Queries
+    # ----
+    def summary(self, dimension, month=ALL_MONTHS, keys=None, order="reviews",
+                min_reviews=1, limit=None) -> pd.DataFrame:
+        """
+        One row per key of `dimension`: reviews, mean overall_rating, mean
+        predicted stars, positive sentiment share and complaint (negative)
+        count, for one month or all time.
+        """
+        if dimension not in DIMENSIONS:
+            raise ValueError(f"unknown dimension {dimension!r}; expected one of {list(DIMENSIONS)}")
+        query = """
+            SELECT key, reviews,
+                   rating_sum / NULLIF(rating_n, 0) AS mean_rating,
+                   pred_sum / NULLIF(pred_n, 0) AS mean_pred_stars,
+                   CAST(positive AS REAL) / NULLIF(positive + negative, 0) AS positive_share,
+                   negative AS complaints
+            FROM aggregates WHERE dimension = ? AND month = ? AND reviews >= ?
+        """
+        params = [dimension, month, min_reviews]
+        if keys:
+            query += f" AND key IN ({', '.join('?' * len(keys))})"
+            params += list(keys)
+        query += f" ORDER BY {ORDERS[order]}"
+        if limit:
+            query += " LIMIT ?"
+            params.append(limit)
+        return pd.read_sql_query(query, self.conn, params=params)
+
+    def worst(self, dimension, n=10, min_reviews=MIN_REVIEWS) -> pd.DataFrame:
+        """Keys with the lowest mean overall_rating."""
+        return self.summary(dimension, order="worst", min_reviews=min_reviews, limit=n)
+
+    def most_complaints(self, dimension, n=10, min_reviews=1) -> pd.DataFrame:
+        """Keys with the most negative-sentiment reviews."""
+        return self.summary(dimension, order="complaints", min_reviews=min_reviews, limit=n)
+
+    def compare(self, dimension, keys) -> pd.DataFrame:
+        return self.summary(dimension, keys=keys)
+
+    def trend(self, dimension, key) -> pd.DataFrame:
+        """Month-by-month figures for one key."""
+        return pd.read_sql_query("""
+            SELECT month, reviews,
+                   rating_sum / NULLIF(rating_n, 0) AS mean_rating,
+                   pred_sum / NULLIF(pred_n, 0) AS mean_pred_stars,
+                   CAST(positive AS REAL) / NULLIF(positive + negative, 0) AS positive_share,
+                   negative AS complaints
+            FROM aggregates WHERE dimension = ? AND key = ? AND month != ?
+            ORDER BY month
+        """, self.conn, params=[dimension, str(key), ALL_MONTHS])
+
+    def close(self):
+        self.conn.close()
+
+
+def rebuild(store: AggregateStore, chunk_size=100_000) -> int:
+    """Recompute the store from the cleaned table (e.g. after re-scoring)."""
+    store.clear()
+    return sum(store.add(df) for df in storage.iter_chunks(storage.CLEANED, chunk_size=chunk_size))
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Answer review questions from precomputed aggregates.")
+    arg_parser.add_argument("--store", default=STORE_FILE)
+    commands = arg_parser.add_subparsers(dest="command", required=True)
+    for name, help_text in [("worst", "lowest mean rating"), ("complaints", "most negative reviews"),
+                            ("summary", "every key, most reviewed first")]:
+        sub = commands.add_parser(name, help=help_text)
+        sub.add_argument("dimension", choices=list(DIMENSIONS))
+        sub.add_argument("-n", type=int, default=10)
+        sub.add_argument("--min-reviews", type=int, default=MIN_REVIEWS if name == "worst" else 1)
+        sub.add_argument("--month", default=ALL_MONTHS, help="YYYY-MM (default: all time)")
+    compare = commands.add_parser("compare", help="side by side figures for some keys")
+    compare.add_argument("dimension", choices=list(DIMENSIONS))
+    compare.add_argument("keys", nargs="+")
+    trend = commands.add_parser("trend", help="monthly figures for one key")
+    trend.add_argument("dimension", choices=list(DIMENSIONS))
+    trend.add_argument("key")
+    commands.add_parser("rebuild", help=f"recompute from {storage.CLEANED}")
+    args = arg_parser.parse_args()
+
+    store = AggregateStore(args.store)
+    start = time.perf_counter()
+    if args.command == "rebuild":
+        print(f"Folded {rebuild(store)} reviews into {args.store}")
+    else:
+        if args.command == "compare":
+            result = store.compare(args.dimension, args.keys)
+        elif args.command == "trend":
+            result = store.trend(args.dimension, args.key)
+        else:
+            order = {"worst": "worst", "complaints": "complaints", "summary": "reviews"}[args.command]
+            result = store.summary(args.dimension, month=args.month, order=order,
+                                   min_reviews=args.min_reviews, limit=args.n)
+        with pd.option_context("display.width", 160, "display.max_columns", None):
+            print(result.to_string(index=False))
+    print(f"({(time.perf_counter() - start) * 1000:.1f} ms)")
+    store.close()
@@ -0,0 +1,125 @@
+# route_lookup.py
+#
+# Columnar route standardization (IATA codes -> city names) used by
+# 05_Final_Data_Cleaning.py
+
+# ----
+# 1) Imports
+# ----
+import os
+
+import airportsdata
+import numpy as np
+import pandas as pd
+
+# ----
+# 2) Trimmed airport table
+# ----
+AIRPORTS_CACHE = "airports_iata_{version}.parquet"
+UNKNOWN_ROUTE = "Unknown Route"
+
+
+def load_airports(cache=AIRPORTS_CACHE) -> pd.DataFrame:
+    """
+    IATA code -> city, country, loaded from a small Parquet cache. The
+    cache name carries the airportsdata version, so upgrading the package
+    rebuilds it.
+    """
+    version = getattr(airportsdata, "__version__", "unknown")
+    path = cache.format(version=version)
+    if os.path.exists(path):
+        return pd.read_parquet(path).set_index("iata")
+
+    iata_dict = airportsdata.load("IATA")
+    airports = pd.DataFrame({
+        "iata": list(iata_dict),
+        "city": [a.get("city") for a in iata_dict.values()],
+        "country": [a.get("country") for a in iata_dict.values()],
+    })
+    airports.to_parquet(path, index=False)
+    return airports.set_index("iata")
+
+
+def iata_to_city(codes: pd.Series, airports: pd.DataFrame):
+    """
+    Convert IATA codes to (city, country code) Series. Anything that is
+    not a three-letter upper-case code, or is not a known airport, keeps
+    the code itself as the city and gets no country.
+    """
+    codes = codes.astype(object)
+    is_iata = (codes.str.len() == 3) & codes.str.isupper().astype("boolean").fillna(False).astype(bool)
+    known = is_iata & codes.isin(airports.index)
+    city = codes.where(~known, codes.map(airports["city"]))
+    country = codes.map(airports["country"]).where(known)
+    return city, country
+
+
+# ----
+# 3) Route standardization
+# ----
+def _expand(values: pd.Series, codes) -> pd.Categorical:
+    """Per-unique values -> per-row categorical, via the rows' unique codes."""
+    cat = pd.Categorical(values)
+    return pd.Categorical.from_codes(cat.codes[codes], categories=cat.categories)
+
+
+def standardize_routes(routes: pd.Series, airports: pd.DataFrame) -> pd.DataFrame:
+    """
+    Turn routes like "LHR to JFK" into city routes. Work is done once per
+    distinct route and joined back by code, so cost follows the number of
+    unique routes rather than reviews.
+
+    Returns a frame aligned with `routes` with route_city,
+    origin_country_code, dest_country_code, origin_city and dest_city, all
+    categorical.
+    """
+    columns = ["route_city", "origin_country_code", "dest_country_code", "origin_city", "dest_city"]
+    if routes.empty:
+        return pd.DataFrame({col: pd.Categorical([]) for col in columns}, index=routes.index)
+
+    codes, uniq = pd.factorize(routes)
+    # Missing routes (code -1) become the last entry, UNKNOWN_ROUTE
+    uniq = pd.Series(list(uniq) + [UNKNOWN_ROUTE], dtype=object).astype(str)
+    codes = np.where(codes < 0, len(uniq) - 1, codes)
+
+    has_to = uniq.str.contains(" to ", regex=False) & (uniq != UNKNOWN_ROUTE)
+    # Split at the first " to "; anything after it belongs to the destination.
+    # partition() always yields string columns, even when no route has " to "
+    parts = uniq.str.partition(" to ")
+    origin_city, origin_cc = iata_to_city(parts[0].str.strip().where(has_to), airports)
+    dest_city, dest_cc = iata_to_city(parts[2].str.strip().where(has_to), airports)
+
+    route_city = (origin_city.astype(str) + " to " + dest_city.astype(str)).where(has_to, uniq)
+    city_parts = route_city.str.split(" to ")
+    is_route = route_city.str.contains(" to ", regex=False)
+
+    table = [
+        route_city,
+        origin_cc.where(has_to),
+        dest_cc.where(has_to),
+        city_parts.str[0].where(is_route),
+        city_parts.str[1].where(is_route),
+    ]
+    return pd.DataFrame({col: _expand(values, codes) for col, values in zip(columns, table)},
+                        index=routes.index)
+
+
+def place_country_codes(place: pd.Series) -> pd.Series:
+    """Country code from the end of a "City, CC" place string, else NaN (categorical)."""
+    codes, uniq = pd.factorize(place)
+    uniq = pd.Series(uniq, dtype=object)
+    has_comma = uniq.str.contains(",", regex=False).astype("boolean").fillna(False).astype(bool)
+    cc = uniq.where(has_comma).str.rsplit(",", n=1).str[-1].str.strip().str.upper()
+    # code -1 (missing place) selects the appended NaN
+    return pd.Series(_expand(pd.concat([cc, pd.Series([np.nan])], ignore_index=True), codes),
+                     index=place.index)
+
+
+def coalesce(first: pd.Series, fallback: pd.Series) -> pd.Series:
+    """first where it has a value, else fallback; both categorical, result categorical."""
+    first, fallback = first.astype("category"), fallback.astype("category")
+    categories = first.cat.categories.union(fallback.cat.categories)
+    a = first.cat.set_categories(categories).cat.codes.to_numpy()
+    b = fallback.cat.set_categories(categories).cat.codes.to_numpy()
+    return pd.Series(pd.Categorical.from_codes(np.where(a >= 0, a, b), categories=categories),
+                     index=first.index)
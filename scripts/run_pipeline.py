@@ -0,0 +1,260 @@
+# run_pipeline.py
+#
+# Runs the stage scripts as a DAG, skipping stages whose inputs and
+# code have not changed since their last successful run.
+#
+#   python run_pipeline.py              # run whatever is out of date
+#   python run_pipeline.py --force 03   # re-run 03 (and whatever it changes)
+#   python run_pipeline.py --refresh    # also re-scrape (stage 01)
+#   python run_pipeline.py --force 05 --profile cprofile   # profile a stage
+#
+# Run it from the data directory, like the scripts themselves.
+
+# ----
+# 1) Imports
+# ----
+import argparse
+import ast
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime
+
+import storage
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+STATE_FILE = "pipeline_state.json"
+REPORT_FILE = "pipeline_run_report.json"
+LOG_DIR = "pipeline_logs"
+
+
+# ----
+# 2) Stage definitions
+# ----
+class Stage:
+    """
+    One script of the pipeline. Dependencies are derived from which stage
+    writes each input. `external` stages read from outside the repo (the
+    website), so they only run when their outputs are missing or when
+    asked to.
+    """
+
+    def __init__(self, name, script, inputs=(), outputs=(), external=False):
+        self.name = name
+        self.script = script
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.external = external
+
+
+def table(name):
+    return storage.parquet_path(name)
+
+
+STAGES = [
+    Stage("01", "01_Scrape_BA_Reviews.py", outputs=[table(storage.RAW)], external=True),
+    Stage("01b", "01b_Remove_Near_Duplicates.py",
+          inputs=[table(storage.RAW)],
+          outputs=[table(storage.DEDUPED)]),
+    Stage("02", "02_Fuzzy_Keyword_Matching.py",
+          inputs=[table(storage.DEDUPED), "ba_reviews.csv"],
+          outputs=[table(storage.FUZZY)]),
+    Stage("03", "03_Sentiment_and_Star_Rating.py",
+          inputs=[table(storage.FUZZY)],
+          outputs=[table(storage.SENTIMENT), table(storage.STAR_RATINGS)]),
+    Stage("04", "04_Exploratory_Analysis.py",
+          inputs=[table(storage.STAR_RATINGS)],
+          outputs=["wordcloud.png"]),
+    Stage("05", "05_Final_Data_Cleaning.py",
+          inputs=[table(storage.STAR_RATINGS), "worldcities.csv"],
+          outputs=[table(storage.CLEANED)]),
+]
+
+
+def dependencies(stages: list) -> dict:
+    """{stage name: set of stage names producing its inputs}."""
+    producers = {out: s.name for s in stages for out in s.outputs}
+    return {s.name: {producers[i] for i in s.inputs if i in producers} for s in stages}
+
+
+# ----
+# 3) Fingerprints
+# ----
+def file_hash(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def resolve_input(path: str) -> str:
+    """A Parquet input that has not been written yet may still exist as CSV."""
+    if not os.path.exists(path) and path.endswith(".parquet"):
+        legacy = path[:-len(".parquet")] + ".csv"
+        if os.path.exists(legacy):
+            return legacy
+    return path
+
+
+def code_files(script: str) -> list:
+    """The script plus every sibling module it imports, recursively."""
+    seen, todo = set(), [script]
+    while todo:
+        name = todo.pop()
+        if name in seen:
+            continue
+        seen.add(name)
+        with open(os.path.join(SCRIPTS_DIR, name), encoding="utf-8") as f:
+            tree = ast.parse(f.read())
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                modules = [alias.name for alias in node.names]
+            elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+                modules = [node.module]
+            else:
+                continue
+            for module in modules:
+                candidate = module.split(".")[0] + ".py"
+                if os.path.exists(os.path.join(SCRIPTS_DIR, candidate)):
+                    todo.append(candidate)
+    return sorted(seen)
+
+
+def fingerprint(stage: Stage) -> dict:
+    """Hashes of the stage's input files and code; None for a missing input."""
+    result = {}
+    for path in stage.inputs:
+        path = resolve_input(path)
+        result[path] = file_hash(path) if os.path.exists(path) else None
+    for name in code_files(stage.script):
+        result[f"code:{name}"] = file_hash(os.path.join(SCRIPTS_DIR, name))
+    return result
+
+
+# ----
+# 4) Running one stage
+# ----
+def run_script(stage: Stage, profile=None) -> dict:
+    """Run a stage script in its own process; return exit code, wall time, peak RSS."""
+    os.makedirs(LOG_DIR, exist_ok=True)
+    env = dict(os.environ, MPLBACKEND="Agg")  # never block on a plot window
+    if profile:
+        env["PIPELINE_PROFILE"] = profile  # picked up by instrumentation.start_run
+    log_path = os.path.join(LOG_DIR, f"{stage.name}.log")
+    start = time.perf_counter()
+    with open(log_path, "w") as log:
+        proc = subprocess.Popen([sys.executable, os.path.join(SCRIPTS_DIR, stage.script)],
+                                stdout=log, stderr=subprocess.STDOUT, env=env)
+        if hasattr(os, "wait4"):
+            # wait4 reports the resource usage of exactly this child
+            _, status, usage = os.wait4(proc.pid, 0)
+            proc.returncode = os.waitstatus_to_exitcode(status)
+            scale = 1 if sys.platform == "darwin" else 1024
+            peak_rss_mb = usage.ru_maxrss * scale / 2**20
+        else:
+            proc.wait()
+            peak_rss_mb = None
+    return {
+        "returncode": proc.returncode,
+        "seconds": time.perf_counter() - start,
+        "peak_rss_mb": peak_rss_mb,
+        "log": log_path,
+    }
+
+
+# ----
+# 5) Scheduler
+# ----
+def run_pipeline(stages=STAGES, force=(), refresh=False, jobs=2, dry_run=False, profile=None) -> dict:
+    deps = dependencies(stages)
+    by_name = {s.name: s for s in stages}
+    state = {}
+    if os.path.exists(STATE_FILE):
+        with open(STATE_FILE) as f:
+            state = json.load(f)
+
+    report = {"started_at": datetime.now().isoformat(timespec="seconds"), "stages": {}}
+    done, failed = set(), set()
+    pending = [s.name for s in stages]
+    running = {}
+
+    def decide(stage):
+        """Return (reason to run or None, fingerprint)."""
+        fp = fingerprint(stage)
+        if stage.name in force:
+            return "forced", fp
+        if stage.external and refresh:
+            return "refresh", fp
+        if any(not os.path.exists(out) for out in stage.outputs):
+            return "missing output", fp
+        if stage.external:
+            return None, fp
+        if state.get(stage.name) != fp:
+            return "inputs or code changed", fp
+        return None, fp
+
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        while pending or running:
+            for name in list(pending):
+                if deps[name] & failed:
+                    pending.remove(name)
+                    failed.add(name)
+                    report["stages"][name] = {"status": "blocked"}
+                    print(f"[{name}] blocked by a failed upstream stage")
+                elif deps[name] <= done:
+                    pending.remove(name)
+                    stage = by_name[name]
+                    reason, fp = decide(stage)
+                    if reason is None or dry_run:
+                        done.add(name)
+                        status = "would run" if reason else "skipped"
+                        report["stages"][name] = {"status": status, "reason": reason}
+                        print(f"[{name}] {status}" + (f" ({reason})" if reason else ""))
+                    else:
+                        print(f"[{name}] running {stage.script} ({reason})")
+                        running[pool.submit(run_script, stage, profile)] = (name, fp, reason)
+
+            if not running:
+                continue
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name, fp, reason = running.pop(future)
+                result = future.result()
+                ok = result["returncode"] == 0
+                report["stages"][name] = {"status": "ran" if ok else "failed", "reason": reason, **result}
+                print(f"[{name}] {'done' if ok else 'FAILED'} in {result['seconds']:.1f}s, see {result['log']}")
+                if ok:
+                    done.add(name)
+                    # Record the fingerprint the stage actually ran against
+                    state[name] = fp
+                else:
+                    failed.add(name)
+
+    report["finished_at"] = datetime.now().isoformat(timespec="seconds")
+    if not dry_run:
+        with open(STATE_FILE, "w") as f:
+            json.dump(state, f, indent=2)
+        with open(REPORT_FILE, "w") as f:
+            json.dump(report, f, indent=2)
+    return report
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Run the review pipeline, skipping up-to-date stages.")
+    arg_parser.add_argument("--force", nargs="*", default=[], metavar="STAGE",
+                            help="stages to re-run regardless of fingerprints, e.g. 02 03")
+    arg_parser.add_argument("--refresh", action="store_true", help="re-run the scraper (stage 01)")
+    arg_parser.add_argument("--jobs", type=int, default=2, help="stages to run at the same time")
+    arg_parser.add_argument("--dry-run", action="store_true", help="only report what would run")
+    arg_parser.add_argument("--profile", choices=["cprofile", "pyinstrument"],
+                            help="also write a profile of each stage that runs to traces/")
+    args = arg_parser.parse_args()
+
+    report = run_pipeline(force=set(args.force), refresh=args.refresh, jobs=args.jobs,
+                          dry_run=args.dry_run, profile=args.profile)
+    sys.exit(1 if any(s["status"] in ("failed", "blocked") for s in report["stages"].values()) else 0)
@@ -0,0 +1,369 @@
+# sentiment_inference.py
+#
+# Batched, cached inference helpers used by 03_Sentiment_and_Star_Rating.py
+
+# ----
+# 1) Imports
+# ----
+import hashlib
+import sqlite3
+import time
+
+import numpy as np
+
+import instrumentation
+
+# ----
+# 2) Defaults
+# ----
+CACHE_FILE = "inference_cache.sqlite"
+BATCH_SIZE = 32
+MAX_CHARS = 512  # same character-level truncation the stage has always used
+WINDOW_OVERLAP = 64  # tokens shared by neighbouring windows of a long review
+GROUP_BATCHES = 8    # batches of windows scored before results are cached
+
+
+def content_hash(text: str) -> str:
+    """Stable hash of a review's text, used as the cache key."""
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def model_key(pipe) -> str:
+    """Name a pipeline's model so cached results are never mixed across models."""
+    return getattr(pipe.model, "name_or_path", None) or type(pipe.model).__name__
+
+
+# ----
+# 3) On-disk result cache
+# ----
+class ResultCache:
+    """
+    SQLite-backed store of (model, content hash) -> (label, score), plus
+    full label probabilities and token ids for the combined scorer.
+    Results are committed batch by batch, so an interrupted run resumes
+    where it stopped.
+    """
+
+    def __init__(self, path=CACHE_FILE):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            " model TEXT NOT NULL,"
+            " content_hash TEXT NOT NULL,"
+            " label TEXT NOT NULL,"
+            " score REAL,"
+            " PRIMARY KEY (model, content_hash))"
+        )
+        for table in ("probabilities", "tokens"):
+            self.conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} ("
+                " model TEXT NOT NULL,"
+                " content_hash TEXT NOT NULL,"
+                " value BLOB NOT NULL,"
+                " PRIMARY KEY (model, content_hash))"
+            )
+        self.conn.commit()
+
+    def _select(self, table: str, columns: str, model: str, hashes) -> list:
+        rows = []
+        hashes = list(hashes)
+        # Stay well under SQLite's bound-parameter limit
+        for start in range(0, len(hashes), 500):
+            chunk = hashes[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            rows.extend(self.conn.execute(
+                f"SELECT content_hash, {columns} FROM {table} "
+                f"WHERE model = ? AND content_hash IN ({placeholders})",
+                [model, *chunk],
+            ))
+        return rows
+
+    def get_many(self, model: str, hashes: list) -> dict:
+        """Return {hash: (label, score)} for every hash already scored by model."""
+        return {h: (label, score) for h, label, score in self._select("results", "label, score", model, hashes)}
+
+    def put_many(self, model: str, items: list):
+        """Store [(hash, label, score), ...] for model."""
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO results (model, content_hash, label, score) "
+            "VALUES (?, ?, ?, ?)",
+            [(model, h, label, score) for h, label, score in items],
+        )
+        self.conn.commit()
+
+    def get_probs(self, model: str, hashes) -> dict:
+        """Return {hash: float32 probability vector} already stored for model."""
+        rows = self._select("probabilities", "value", model, hashes)
+        return {h: np.frombuffer(value, dtype=np.float32) for h, value in rows}
+
+    def put_probs(self, model: str, items: list):
+        """Store [(hash, probability vector), ...] for model."""
+        self._put("probabilities", model, [(h, np.asarray(p, dtype=np.float32).tobytes()) for h, p in items])
+
+    def get_tokens(self, model: str, hashes) -> dict:
+        """Return {hash: list of token ids} already stored for model's tokenizer."""
+        rows = self._select("tokens", "value", model, hashes)
+        return {h: np.frombuffer(value, dtype=np.int32).tolist() for h, value in rows}
+
+    def put_tokens(self, model: str, items: list):
+        """Store [(hash, token ids), ...] for model's tokenizer."""
+        self._put("tokens", model, [(h, np.asarray(ids, dtype=np.int32).tobytes()) for h, ids in items])
+
+    def _put(self, table: str, model: str, items: list):
+        self.conn.executemany(
+            f"INSERT OR REPLACE INTO {table} (model, content_hash, value) VALUES (?, ?, ?)",
+            [(model, h, value) for h, value in items],
+        )
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+
+# ----
+# 4) Batched scoring
+# ----
+def token_lengths(pipe, texts: list) -> list:
+    """Token count of each text under the pipeline's own tokenizer."""
+    if not texts:
+        return []
+    encoded = pipe.tokenizer(texts, truncation=True, add_special_tokens=True)
+    return [len(ids) for ids in encoded["input_ids"]]
+
+
+def score_texts(texts, pipe, cache: ResultCache, model: str = None,
+                batch_size: int = BATCH_SIZE, max_chars: int = MAX_CHARS,
+                debug=False) -> list:
+    """
+    Score every text with pipe and return the labels in input order.
+
+    Identical texts are scored once, texts already in the cache for this
+    model are not scored at all, and the remainder are sorted by token
+    length and fed to the model in bounded batches so padding stays small.
+    """
+    model = model or model_key(pipe)
+    texts = ["" if not isinstance(t, str) else t[:max_chars] for t in texts]
+    hashes = [content_hash(t) for t in texts]
+
+    results = cache.get_many(model, set(hashes))
+
+    # Unique texts that still need scoring
+    pending = {}
+    for h, t in zip(hashes, texts):
+        if h not in results and h not in pending:
+            pending[h] = t
+
+    instrumentation.count("inference.cached", len(results))
+    instrumentation.count("inference.scored", len(pending))
+    if debug:
+        print(f"DEBUG: {model}: {len(results)} cached, {len(pending)} to score")
+
+    if pending:
+        todo = list(pending.items())
+        lengths = token_lengths(pipe, [t for _, t in todo])
+        todo = [item for _, item in sorted(zip(lengths, todo), key=lambda x: x[0])]
+
+        for start in range(0, len(todo), batch_size):
+            batch = todo[start:start + batch_size]
+            with instrumentation.timer("inference.batch", model=model, size=len(batch)):
+                outputs = pipe([t for _, t in batch], batch_size=len(batch), truncation=True)
+            scored = [(h, out["label"], float(out["score"])) for (h, _), out in zip(batch, outputs)]
+            cache.put_many(model, scored)
+            for h, label, score in scored:
+                results[h] = (label, score)
+
+    return [results[h][0] for h in hashes]
+
+
+# ----
+# 5) Combined single-encoder scoring
+# ----
+# Share of each star class counted as positive when deriving binary sentiment
+POSITIVE_WEIGHT = {1: 0.0, 2: 0.0, 3: 0.5, 4: 1.0, 5: 1.0}
+
+
+class CombinedScorer:
+    """
+    Runs only the star-rating model: each review is tokenized once,
+    truncated by tokens rather than characters, and its five-class
+    distribution gives both the star label and the binary sentiment.
+    """
+
+    def __init__(self, pipe, max_length=512):
+        import torch
+
+        self.torch = torch
+        self.tokenizer = pipe.tokenizer
+        self.model = pipe.model
+        self.max_length = min(max_length, self.tokenizer.model_max_length)
+        self.n_special = self.tokenizer.num_special_tokens_to_add()
+        config = self.model.config
+        self.labels = [config.id2label[i] for i in range(config.num_labels)]
+        # nlptown labels look like "1 star" / "4 stars"
+        self.stars = np.array([int(label.split()[0]) for label in self.labels])
+        self.positive_weight = np.array([POSITIVE_WEIGHT[s] for s in self.stars])
+
+    def encode(self, texts: list) -> list:
+        """Token ids without special tokens or truncation."""
+        if not texts:
+            return []
+        return self.tokenizer(texts, add_special_tokens=False, truncation=False,
+                              verbose=False)["input_ids"]
+
+    def predict(self, id_lists: list) -> np.ndarray:
+        """Label probabilities for token id lists, truncated to max_length."""
+        keep = self.max_length - self.n_special
+        inputs = [self.tokenizer.build_inputs_with_special_tokens(ids[:keep]) for ids in id_lists]
+        batch = self.tokenizer.pad({"input_ids": inputs}, return_tensors="pt")
+        if "token_type_ids" in self.tokenizer.model_input_names and "token_type_ids" not in batch:
+            batch["token_type_ids"] = self.torch.zeros_like(batch["input_ids"])
+        with self.torch.no_grad():
+            logits = self.model(**batch).logits
+        return self.torch.softmax(logits.float(), dim=-1).numpy()
+
+    def summarize(self, probs: np.ndarray) -> dict:
+        """Per-row columns derived from an (n, n_labels) probability matrix."""
+        positive = probs @ self.positive_weight
+        columns = {
+            "pred_star_ratings": [self.labels[i] for i in probs.argmax(axis=1)],
+            "pred_sentiment": np.where(positive >= 0.5, "POSITIVE", "NEGATIVE").tolist(),
+            "sentiment_score": positive,
+        }
+        for j, stars in enumerate(self.stars):
+            columns[f"star_prob_{stars}"] = probs[:, j]
+        return columns
+
+
+def cached_tokens(scorer: CombinedScorer, cache: ResultCache, model: str, items: dict) -> dict:
+    """Token ids for {hash: text}, tokenizing only what the cache lacks."""
+    tokens = cache.get_tokens(model, items)
+    missing = [h for h in items if h not in tokens]
+    if missing:
+        encoded = scorer.encode([items[h] for h in missing])
+        cache.put_tokens(model, list(zip(missing, encoded)))
+        tokens.update(zip(missing, encoded))
+    return tokens
+
+
+def split_windows(ids: list, size: int, overlap: int, max_windows: int) -> list:
+    """
+    Overlapping windows of at most `size` tokens covering ids. The window
+    count grows with length up to max_windows; past that, windows are
+    spread evenly from the start to the end of the review. max_windows=1
+    is plain truncation to the first `size` tokens.
+    """
+    if len(ids) <= size or max_windows <= 1:
+        return [ids[:size]]
+    stride = max(size - overlap, 1)
+    last = len(ids) - size
+    starts = list(range(0, last, stride)) + [last]
+    if len(starts) > max_windows:
+        starts = sorted(set(np.linspace(0, last, max_windows).round().astype(int).tolist()))
+    return [ids[s:s + size] for s in starts]
+
+
+def score_combined(texts, scorer: CombinedScorer, cache: ResultCache, model: str,
+                   batch_size: int = BATCH_SIZE, max_windows: int = 1,
+                   overlap: int = WINDOW_OVERLAP, debug=False) -> dict:
+    """
+    Score every text with one star-model pass and return per-row columns
+    (labels, sentiment score and star probabilities) in input order.
+    Cached and duplicate texts are skipped as in score_texts().
+
+    With max_windows > 1, reviews longer than the model limit are split
+    into overlapping token windows. Windows from many reviews are batched
+    together and their probabilities averaged, weighted by window length.
+    """
+    key = f"{model}#combined" if max_windows <= 1 else f"{model}#windowed-{max_windows}x{overlap}"
+    texts = ["" if not isinstance(t, str) else t for t in texts]
+    hashes = [content_hash(t) for t in texts]
+
+    probs = cache.get_probs(key, set(hashes))
+    pending = {}
+    for h, t in zip(hashes, texts):
+        if h not in probs and h not in pending:
+            pending[h] = t
+
+    instrumentation.count("inference.cached", len(probs))
+    instrumentation.count("inference.scored", len(pending))
+    if debug:
+        print(f"DEBUG: {key}: {len(probs)} cached, {len(pending)} to score")
+
+    if pending:
+        tokens = cached_tokens(scorer, cache, model, pending)
+        size = scorer.max_length - scorer.n_special
+        # Shortest first, so each batch pads to a similar length
+        todo = sorted(pending, key=lambda h: len(tokens[h]))
+        group = batch_size * GROUP_BATCHES
+        for g in range(0, len(todo), group):
+            reviews = todo[g:g + group]
+            windows = [(h, w) for h in reviews
+                       for w in split_windows(tokens[h], size, overlap, max_windows)]
+            windows.sort(key=lambda item: len(item[1]))
+
+            sums = {h: 0.0 for h in reviews}
+            weights = {h: 0 for h in reviews}
+            for start in range(0, len(windows), batch_size):
+                batch = windows[start:start + batch_size]
+                with instrumentation.timer("inference.batch", model=key, size=len(batch),
+                                           tokens=max(len(w) for _, w in batch)):
+                    batch_probs = scorer.predict([w for _, w in batch])
+                for (h, w), row in zip(batch, batch_probs):
+                    sums[h] = sums[h] + max(len(w), 1) * row
+                    weights[h] += max(len(w), 1)
+
+            scored = [(h, sums[h] / weights[h]) for h in reviews]
+            cache.put_probs(key, scored)
+            probs.update(scored)
+
+    return scorer.summarize(np.vstack([probs[h] for h in hashes]) if hashes
+                            else np.zeros((0, len(scorer.labels))))
+
+
+def benchmark_windowing(texts: list, scorer: CombinedScorer, max_windows=8,
+                        overlap=WINDOW_OVERLAP, batch_size=BATCH_SIZE) -> list:
+    """
+    Throughput of combined scoring with plain truncation vs sliding
+    windows on the same reviews, using a throwaway in-memory cache.
+    """
+    results = []
+    n_tokens = sum(len(ids) for ids in scorer.encode(list(texts)))
+    for windows in (1, max_windows):
+        cache = ResultCache(":memory:")
+        start = time.perf_counter()
+        score_combined(texts, scorer, cache, "benchmark", batch_size=batch_size,
+                       max_windows=windows, overlap=overlap)
+        seconds = time.perf_counter() - start
+        cache.close()
+        results.append({
+            "max_windows": windows,
+            "reviews": len(texts),
+            "tokens": n_tokens,
+            "seconds": seconds,
+            "reviews_per_second": len(texts) / seconds if seconds else float("inf"),
+            "tokens_per_second": n_tokens / seconds if seconds else float("inf"),
+        })
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+    import random
+
+    import storage
+    from model_backends import MODEL_DIR, STAR_MODEL, load_pipeline
+
+    arg_parser = argparse.ArgumentParser(description="Benchmark combined scoring with and without windowing.")
+    arg_parser.add_argument("--sample", type=int, default=300)
+    arg_parser.add_argument("--max-windows", type=int, default=8)
+    arg_parser.add_argument("--backend", default="pytorch")
+    args = arg_parser.parse_args()
+
+    content = storage.load_table(storage.FUZZY, columns=["content"])["content"].dropna()
+    sample = list(content.astype(str))
+    random.Random(42).shuffle(sample)
+    scorer = CombinedScorer(load_pipeline(STAR_MODEL, args.backend, MODEL_DIR))
+    for result in benchmark_windowing(sample[:args.sample], scorer, max_windows=args.max_windows):
+        print(f"max_windows={result['max_windows']}: {result['reviews_per_second']:.1f} reviews/s, "
+              f"{result['tokens_per_second']:.0f} tokens/s ({result['seconds']:.1f}s)")
@@ -0,0 +1,256 @@
+# storage.py
+#
+# Typed, columnar storage for the tables passed between pipeline stages.
+#
+#   python storage.py raw_ba_reviews_with_star_ratings   # Parquet vs CSV load cost
+
+# ----
+# 1) Imports
+# ----
+import argparse
+import os
+import subprocess
+import sys
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# ----
+# 2) Stage tables
+# ----
+RAW = "raw_ba_reviews"
+DEDUPED = "raw_ba_reviews_deduplicated"
+FUZZY = "raw_ba_reviews_with_fuzzy_matches"
+SENTIMENT = "raw_ba_reviews_with_sentiment"
+STAR_RATINGS = "raw_ba_reviews_with_star_ratings"
+CLEANED = "cleaned_ba_reviews_with_geodata"
+
+# Low-cardinality columns stored as dictionary-encoded categoricals
+CATEGORICAL_COLUMNS = [
+    "verified", "overall_rating",
+    # written by 05_Final_Data_Cleaning.py
+    "route_city", "origin_city", "dest_city",
+    "origin_country_code", "dest_country_code", "place_country_code",
+]
+CATEGORICAL_PREFIX = "pred_"
+
+# CSV fallback reads: only empty fields are missing, so authors or places
+# spelled "NA", "None" or "null" keep their text (and their review keys)
+CSV_READ_OPTIONS = {"keep_default_na": False, "na_values": [""]}
+
+
+def parquet_path(name: str) -> str:
+    return f"{name}.parquet"
+
+
+def csv_path(name: str) -> str:
+    return f"{name}.csv"
+
+
+def exists(name: str) -> bool:
+    return os.path.exists(parquet_path(name)) or os.path.exists(csv_path(name))
+
+
+def _is_categorical(name: str) -> bool:
+    return name in CATEGORICAL_COLUMNS or name.startswith(CATEGORICAL_PREFIX)
+
+
+def to_storage_types(df: pd.DataFrame) -> pd.DataFrame:
+    """Convert string/integer label columns to categoricals."""
+    df = df.copy(deep=False)
+    for col in df.columns:
+        if _is_categorical(col):
+            dtype = df[col].dtype
+            if dtype == object or pd.api.types.is_integer_dtype(dtype):
+                df[col] = df[col].astype("category")
+    return df
+
+
+# ----
+# 3) Save / load
+# ----
+def save_table(df: pd.DataFrame, name: str, csv=False):
+    """Write df as typed Parquet (and optionally a CSV copy for humans)."""
+    table = pa.Table.from_pandas(to_storage_types(df), preserve_index=False)
+    pq.write_table(table, parquet_path(name))
+    if csv:
+        df.to_csv(csv_path(name), index=False)
+
+
+def load_table(name: str, columns=None) -> pd.DataFrame:
+    """
+    Read a stage table, only the given columns if any. Parquet files are
+    memory-mapped; a CSV from an older run is used when no Parquet exists.
+    """
+    path = parquet_path(name)
+    if os.path.exists(path):
+        return pq.read_table(path, columns=columns, memory_map=True).to_pandas()
+    return pd.read_csv(csv_path(name), usecols=columns, **CSV_READ_OPTIONS)
+
+
+def _stable_type(field, column):
+    """
+    Column type every chunk is cast to: int32 dictionary indices, null ->
+    string. A column with no values in the first chunk says nothing about
+    its type (pandas gives an all-missing categorical float categories),
+    so it is stored as strings, dictionary-encoded for categoricals.
+    """
+    dtype = field.type
+    if column.null_count == len(column) and (pa.types.is_dictionary(dtype) or _is_categorical(field.name)):
+        return pa.dictionary(pa.int32(), pa.string())
+    if pa.types.is_dictionary(dtype):
+        return pa.dictionary(pa.int32(), dtype.value_type)
+    if pa.types.is_null(dtype):
+        return pa.string()
+    return dtype
+
+
+def _conform(column, dtype):
+    """Cast one column to `dtype`, re-indexing dictionary chunks as needed."""
+    if pa.types.is_null(column.type):
+        return pa.nulls(len(column), dtype)
+    if pa.types.is_dictionary(dtype):
+        if not pa.types.is_dictionary(column.type):
+            column = column.cast(dtype.value_type).dictionary_encode()
+        return pa.chunked_array([
+            pa.DictionaryArray.from_arrays(chunk.indices.cast(pa.int32()),
+                                           chunk.dictionary.cast(dtype.value_type))
+            for chunk in column.chunks
+        ], type=dtype)
+    if pa.types.is_dictionary(column.type):
+        column = column.cast(column.type.value_type)
+    return column.cast(dtype)
+
+
+class TableWriter:
+    """
+    Write a stage table chunk by chunk, so the whole table never has to be
+    in memory: each chunk becomes a Parquet row group (and is appended to
+    the CSV copy if asked). Chunks are cast to the first chunk's schema,
+    with categoricals kept as dictionaries and its all-missing columns
+    taken as strings. Files are written under a
+    temporary name and only replace the old table on close().
+    """
+
+    def __init__(self, name: str, csv=False):
+        self.name = name
+        self.csv = csv
+        self.rows = 0
+        self.schema = None
+        self._writer = None
+
+    def write(self, df: pd.DataFrame):
+        table = pa.Table.from_pandas(to_storage_types(df), preserve_index=False)
+        if self._writer is None:
+            self.schema = pa.schema([f.with_type(_stable_type(f, table.column(f.name)))
+                                     for f in table.schema], metadata=table.schema.metadata)
+            self._writer = pq.ParquetWriter(parquet_path(self.name) + ".tmp", self.schema)
+        table = pa.Table.from_arrays(
+            [_conform(table.column(f.name), f.type) for f in self.schema], schema=self.schema
+        )
+        self._writer.write_table(table)
+        if self.csv:
+            df.to_csv(csv_path(self.name) + ".tmp", index=False,
+                      mode="w" if self.rows == 0 else "a", header=self.rows == 0)
+        self.rows += len(df)
+
+    def close(self):
+        if self._writer is None:
+            # Nothing was written; keep the old behaviour of an empty table
+            save_table(pd.DataFrame(), self.name, csv=self.csv)
+            return
+        self._writer.close()
+        os.replace(parquet_path(self.name) + ".tmp", parquet_path(self.name))
+        if self.csv:
+            os.replace(csv_path(self.name) + ".tmp", csv_path(self.name))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        elif self._writer is not None:
+            self._writer.close()
+        return False
+
+
+def count_rows(name: str) -> int:
+    """Row count, from Parquet metadata when possible."""
+    path = parquet_path(name)
+    if os.path.exists(path):
+        return pq.ParquetFile(path).metadata.num_rows
+    return sum(len(chunk) for chunk in iter_chunks(name))
+
+
+def iter_chunks(name: str, columns=None, chunk_size=10_000, start_row=0):
+    """
+    Yield the table as DataFrames of at most chunk_size rows, from
+    start_row on, without loading the whole table.
+    """
+    path = parquet_path(name)
+    if os.path.exists(path):
+        batches = (b.to_pandas() for b in
+                   pq.ParquetFile(path).iter_batches(batch_size=chunk_size, columns=columns))
+    else:
+        batches = pd.read_csv(csv_path(name), usecols=columns, chunksize=chunk_size, **CSV_READ_OPTIONS)
+
+    seen = 0
+    for chunk in batches:
+        end = seen + len(chunk)
+        if end > start_row:
+            # Only slice when needed, so callers get a frame they can modify
+            yield chunk if seen >= start_row else chunk.iloc[start_row - seen:].copy()
+        seen = end
+
+
+# ----
+# 4) Parquet vs CSV comparison
+# ----
+_MEASURE = """
+import resource, sys, time
+sys.path.insert(0, {here!r})
+import pandas as pd
+import storage
+start = time.perf_counter()
+if {fmt!r} == "csv":
+    df = pd.read_csv(storage.csv_path({name!r}), usecols={columns!r}, **storage.CSV_READ_OPTIONS)
+else:
+    df = storage.load_table({name!r}, columns={columns!r})
+elapsed = time.perf_counter() - start
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(elapsed, rss * (1 if sys.platform == "darwin" else 1024), len(df))
+"""
+
+
+def compare_formats(name: str, columns=None) -> list:
+    """
+    Load `name` from CSV and from Parquet, each in a fresh interpreter so
+    peak RSS is not shared, and return load seconds and peak RSS for both.
+    Needs both files; write the CSV copy with save_table(..., csv=True).
+    """
+    here = os.path.dirname(os.path.abspath(__file__))
+    results = []
+    for fmt in ("csv", "parquet"):
+        code = _MEASURE.format(here=here, fmt=fmt, name=name, columns=columns)
+        out = subprocess.run([sys.executable, "-c", code], check=True,
+                             capture_output=True, text=True).stdout.split()
+        results.append({
+            "format": fmt,
+            "seconds": float(out[0]),
+            "peak_rss_mb": int(out[1]) / 2**20,
+            "rows": int(out[2]),
+        })
+    return results
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Compare Parquet and CSV load time and peak RSS.")
+    arg_parser.add_argument("name", help="table name without extension, e.g. raw_ba_reviews")
+    arg_parser.add_argument("--columns", nargs="*", help="only load these columns")
+    args = arg_parser.parse_args()
+
+    for result in compare_formats(args.name, args.columns):
+        print(f"{result['format']:>8}: {result['rows']} rows in {result['seconds']:.3f}s, "
+              f"peak RSS {result['peak_rss_mb']:.0f} MB")
@@ -0,0 +1,110 @@
+# text_analysis.py
+#
+# Unigram + bigram counts of a chunk from one tokenization pass, shared by
+# the bigram, word-cloud and topic model parts of 04_Exploratory_Analysis.py
+
+# ----
+# 1) Imports
+# ----
+from collections import Counter
+
+import numpy as np
+import scipy.sparse as sp
+from sklearn.feature_extraction.text import CountVectorizer
+
+# ----
+# 2) Defaults
+# ----
+MAX_TERMS = 200_000   # distinct unigrams (and bigrams) kept in the running totals
+
+
+# ----
+# 3) Unigram + bigram counts of one chunk
+# ----
+class SharedTokens:
+    """
+    Sparse document x (unigram + bigram) counts of a chunk of texts, built
+    with a single CountVectorizer pass. Every analysis slices or sums this
+    matrix instead of re-tokenizing the text. Rows line up with the input
+    texts.
+    """
+
+    def __init__(self, texts, stop_words="english"):
+        self.vectorizer = CountVectorizer(ngram_range=(1, 2), stop_words=stop_words)
+        try:
+            self.X = self.vectorizer.fit_transform(texts).tocsr()
+            self.features = self.vectorizer.get_feature_names_out()
+        except ValueError:
+            # No terms at all (empty or stop-word-only chunk)
+            self.vectorizer.vocabulary_ = {}
+            self.X = sp.csr_matrix((len(texts), 0), dtype=np.int64)
+            self.features = np.array([], dtype=object)
+        self.totals = np.asarray(self.X.sum(axis=0)).ravel()
+        self.is_bigram = np.char.find(self.features.astype(str), " ") >= 0
+
+    def _top(self, n, bigrams: bool) -> np.ndarray:
+        """Column indices of the n most frequent uni- or bigrams, alphabetical."""
+        candidates = np.flatnonzero(self.is_bigram == bigrams)
+        order = np.argsort(-self.totals[candidates], kind="stable")[:n]
+        return np.sort(candidates[order])
+
+    def top_unigrams(self, n=1000) -> list:
+        """What CountVectorizer(max_features=n) would keep."""
+        return list(self.features[self._top(n, bigrams=False)])
+
+    def top_bigrams(self, n=20) -> list:
+        return list(self.features[self._top(n, bigrams=True)])
+
+    def counts_for(self, vocabulary: list):
+        """Document x vocabulary counts; terms never seen get all-zero columns."""
+        index = self.vectorizer.vocabulary_
+        cols = np.array([index.get(term, -1) for term in vocabulary])
+        present = np.flatnonzero(cols >= 0)
+        select = sp.csr_matrix(
+            (np.ones(len(present), dtype=self.X.dtype), (cols[present], present)),
+            shape=(self.X.shape[1], len(vocabulary)),
+        )
+        return self.X @ select
+
+
+# ----
+# 4) Running totals over a whole corpus
+# ----
+def _top_terms(counter: Counter, n: int) -> list:
+    return sorted(term for term, _ in counter.most_common(n))
+
+
+class CorpusCounts:
+    """
+    Unigram and bigram totals of a corpus, added up from the SharedTokens
+    of each chunk. Each table keeps at most `max_terms` terms. When it
+    grows past that, the rarer half is dropped, so memory stays bounded
+    while the few hundred terms that get reported keep exact counts.
+    """
+
+    def __init__(self, max_terms=MAX_TERMS):
+        self.max_terms = max_terms
+        self.unigrams = Counter()
+        self.bigrams = Counter()
+        self.documents = 0
+
+    def update(self, tokens: SharedTokens):
+        self.documents += tokens.X.shape[0]
+        for counter, bigrams in ((self.unigrams, False), (self.bigrams, True)):
+            cols = np.flatnonzero(tokens.is_bigram == bigrams)
+            counter.update(dict(zip(tokens.features[cols].tolist(), tokens.totals[cols].tolist())))
+            if len(counter) > self.max_terms:
+                kept = counter.most_common(self.max_terms // 2)
+                counter.clear()
+                counter.update(dict(kept))
+
+    def top_unigrams(self, n=1000) -> list:
+        """The n most frequent unigrams, alphabetical (like CountVectorizer(max_features=n))."""
+        return _top_terms(self.unigrams, n)
+
+    def top_bigrams(self, n=20) -> list:
+        return _top_terms(self.bigrams, n)
+
+    def word_frequencies(self, max_words=200) -> dict:
+        """Unigram -> corpus count, ready for WordCloud.generate_from_frequencies."""
+        return {term: int(count) for term, count in self.unigrams.most_common(max_words)}
@@ -0,0 +1,170 @@
+# topic_modeling.py
+#
+# Streaming, incrementally updated LDA topic model used by
+# 04_Exploratory_Analysis.py
+
+# ----
+# 1) Imports
+# ----
+import os
+
+import joblib
+import numpy as np
+import scipy.sparse as sp
+from sklearn.decomposition import LatentDirichletAllocation
+from sklearn.feature_extraction.text import CountVectorizer
+
+import storage
+from review_index import review_hashes
+from text_analysis import CorpusCounts, SharedTokens
+
+# ----
+# 2) Defaults
+# ----
+MODEL_FILE = "topic_model.joblib"
+N_TOPICS = 5
+MAX_FEATURES = 1000
+CHUNK_SIZE = 5000
+KEY_COLUMNS = ["content", "author", "date"]
+
+
+# ----
+# 3) Model
+# ----
+class StreamingTopicModel:
+    """
+    Online LDA over a fixed vocabulary. The vocabulary is learned once,
+    so any later batch of reviews can be vectorized the same way and
+    folded in with partial_fit() without refitting. `corpus` holds the
+    unigram/bigram totals of everything folded in; `seen` holds the sorted
+    review hashes (review_index.review_hashes) of those reviews.
+    """
+
+    def __init__(self, vocabulary: list, n_topics=N_TOPICS, random_state=42, corpus=None):
+        self.vectorizer = CountVectorizer(vocabulary=vocabulary)
+        self.lda = LatentDirichletAllocation(
+            n_components=n_topics,
+            learning_method="online",
+            random_state=random_state,
+        )
+        self.corpus = corpus if corpus is not None else CorpusCounts()
+        self.seen = np.empty(0, dtype=np.int64)
+
+    @property
+    def vocabulary(self) -> list:
+        return list(self.vectorizer.vocabulary)
+
+    def partial_fit(self, texts, total_samples=None):
+        """Fold a batch of review texts into the topics."""
+        self.partial_fit_counts(self.vectorizer.transform(texts), total_samples)
+
+    def partial_fit_counts(self, X, total_samples=None):
+        """Fold in already-vectorized documents (columns in vocabulary order)."""
+        if total_samples:
+            # Scales each online update to the size of the whole corpus
+            self.lda.total_samples = total_samples
+        if X.shape[0]:
+            self.lda.partial_fit(X)
+
+    def top_words(self, n_words=10) -> list:
+        feature_names = self.vectorizer.get_feature_names_out()
+        return [
+            [feature_names[i] for i in topic.argsort()[:-n_words - 1:-1]]
+            for topic in self.lda.components_
+        ]
+
+    def save(self, path=MODEL_FILE):
+        joblib.dump(self, path)
+
+    @staticmethod
+    def load(path=MODEL_FILE):
+        return joblib.load(path)
+
+
+# ----
+# 4) Fit / update from a stage table
+# ----
+def _texts(chunk):
+    return chunk["content"].dropna().astype(str)
+
+
+def _text_chunks(name, chunk_size, masks=None):
+    """`content` of a table chunk by chunk, optionally only the rows each mask selects."""
+    chunks = storage.iter_chunks(name, ["content"], chunk_size)
+    if masks is None:
+        for chunk in chunks:
+            yield _texts(chunk)
+        return
+    for chunk, mask in zip(chunks, masks):
+        if len(chunk) != len(mask):
+            raise RuntimeError(f"{name} changed while it was being read; run the stage again")
+        yield _texts(chunk[mask])
+
+
+def count_corpus(name=storage.STAR_RATINGS, chunk_size=CHUNK_SIZE, masks=None) -> CorpusCounts:
+    """Unigram/bigram totals of a table's `content`, one chunk in memory at a time."""
+    corpus = CorpusCounts()
+    for texts in _text_chunks(name, chunk_size, masks):
+        corpus.update(SharedTokens(texts))
+    return corpus
+
+
+def document_counts(name=storage.STAR_RATINGS, vocabulary=(), chunk_size=CHUNK_SIZE):
+    """Sparse document x vocabulary counts of a table, vectorized chunk by chunk."""
+    vectorizer = CountVectorizer(vocabulary=list(vocabulary))
+    return sp.vstack([vectorizer.transform(texts)
+                      for texts in _text_chunks(name, chunk_size)]).tocsr()
+
+
+def update_topic_model(name=storage.STAR_RATINGS, model_file=MODEL_FILE, n_topics=N_TOPICS,
+                       max_features=MAX_FEATURES, chunk_size=CHUNK_SIZE, log=print):
+    """
+    Stream the `content` column of a stage table in chunks. Reviews are
+    tracked by hash, so rewritten or reordered tables are handled. The
+    first run (or a refit) reads the table three times: hashing, counting
+    the corpus to pick the vocabulary, and vectorizing for partial_fit().
+    Later runs tokenize only reviews the saved model has not seen, once:
+    their SharedTokens feed both the corpus totals and partial_fit().
+    Memory stays bounded by chunk_size (plus 8 bytes per review for the
+    hashes).
+    """
+    # Hash every review; only the first copy of a repeated review counts
+    chunk_hashes = [review_hashes(chunk) for chunk in storage.iter_chunks(name, KEY_COLUMNS, chunk_size)]
+    hashes = np.concatenate(chunk_hashes) if chunk_hashes else np.empty(0, dtype=np.int64)
+    unique, first_index = np.unique(hashes, return_index=True)
+    first = np.zeros(len(hashes), dtype=bool)
+    first[first_index] = True
+    total_reviews = len(unique)
+
+    model = StreamingTopicModel.load(model_file) if os.path.exists(model_file) else None
+    if model is not None and (getattr(model, "corpus", None) is None or getattr(model, "seen", None) is None):
+        log("Saved model has no corpus totals or review hashes; refitting from scratch.")
+        model = None
+    if model is not None:
+        gone = int((~np.isin(model.seen, unique, assume_unique=True)).sum())
+        if gone:
+            log(f"{gone} reviews in the saved model are no longer in {name}; refitting from scratch.")
+            model = None
+
+    offsets = np.cumsum([len(h) for h in chunk_hashes])[:-1]
+    if model is None:
+        masks = np.split(first, offsets)
+        corpus = count_corpus(name, chunk_size, masks)
+        model = StreamingTopicModel(corpus.top_unigrams(max_features), n_topics=n_topics, corpus=corpus)
+        log(f"Fitting the topic model on {total_reviews} reviews.")
+        for texts in _text_chunks(name, chunk_size, masks):
+            model.partial_fit(texts, total_samples=total_reviews)
+        model.seen = unique
+    else:
+        new = first & ~np.isin(hashes, model.seen)
+        log(f"Folding {int(new.sum())} new reviews into the topic model.")
+        if new.any():
+            for texts in _text_chunks(name, chunk_size, np.split(new, offsets)):
+                if len(texts):
+                    tokens = SharedTokens(texts)
+                    model.corpus.update(tokens)
+                    model.partial_fit_counts(tokens.counts_for(model.vocabulary), total_samples=total_reviews)
+            model.seen = np.union1d(model.seen, hashes[new])
+
+    model.save(model_file)
+    return model
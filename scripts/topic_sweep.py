@@ -0,0 +1,171 @@
+# topic_sweep.py
+#
+# Parallel LDA sweep over topic counts and seeds, used by
+# 04_Exploratory_Analysis.py to help pick n_components.
+
+# ----
+# 1) Imports
+# ----
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import scipy.sparse as sp
+from sklearn.decomposition import LatentDirichletAllocation
+
+# ----
+# 2) Defaults
+# ----
+TOPIC_COUNTS = range(3, 11)
+SEEDS = (0, 1, 2)
+HOLDOUT_EVERY = 10   # every 10th document is held out for perplexity
+TOP_WORDS = 10       # words per topic used for coherence
+RESULTS_FILE = "topic_sweep.json"
+
+
+# ----
+# 3) Document-term matrix in shared memory
+# ----
+def _attach(name):
+    try:
+        # Workers must not unlink the block when they exit (Python 3.13+)
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        return shared_memory.SharedMemory(name=name)
+
+
+class SharedCSR:
+    """
+    A CSR matrix whose data/indices/indptr arrays live in shared memory,
+    so every worker process maps the same pages instead of receiving a
+    pickled copy. Call close() in the owning process when done.
+    """
+
+    def __init__(self, X):
+        X = sp.csr_matrix(X)
+        self.blocks = []
+        self.spec = {"shape": X.shape, "arrays": {}}
+        for key in ("data", "indices", "indptr"):
+            array = getattr(X, key)
+            block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[:] = array
+            self.blocks.append(block)
+            self.spec["arrays"][key] = (block.name, array.shape, array.dtype.str)
+
+    @staticmethod
+    def attach(spec):
+        """Rebuild the matrix over the shared blocks; returns (matrix, blocks)."""
+        blocks, arrays = [], {}
+        for key, (name, shape, dtype) in spec["arrays"].items():
+            block = _attach(name)
+            blocks.append(block)
+            arrays[key] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+        X = sp.csr_matrix((arrays["data"], arrays["indices"], arrays["indptr"]),
+                          shape=spec["shape"], copy=False)
+        return X, blocks
+
+    def close(self):
+        for block in self.blocks:
+            block.close()
+            block.unlink()
+        self.blocks = []
+
+
+# ----
+# 4) Scoring helpers
+# ----
+def umass_coherence(X, components, top_words=TOP_WORDS) -> float:
+    """Mean UMass coherence of the topics, from document co-occurrence in X."""
+    present = (X > 0).astype(np.float64).tocsc()
+    scores = []
+    for topic in components:
+        top = topic.argsort()[::-1][:top_words]
+        D = present[:, top]
+        co = (D.T @ D).toarray()
+        pairs = [
+            np.log((co[i, j] + 1.0) / co[j, j])
+            for i in range(1, len(top)) for j in range(i) if co[j, j] > 0
+        ]
+        if pairs:
+            scores.append(np.mean(pairs))
+    return float(np.mean(scores)) if scores else float("nan")
+
+
+# ----
+# 5) Worker side
+# ----
+_worker = {}
+
+
+def _init_worker(train_spec, test_spec):
+    # Keep the blocks referenced for as long as the worker lives
+    _worker["train"], train_blocks = SharedCSR.attach(train_spec)
+    _worker["test"], test_blocks = SharedCSR.attach(test_spec)
+    _worker["blocks"] = train_blocks + test_blocks
+
+
+def _fit_one(config):
+    k, seed = config
+    start = time.perf_counter()
+    lda = LatentDirichletAllocation(n_components=k, random_state=seed, n_jobs=1)
+    lda.fit(_worker["train"])
+    fit_seconds = time.perf_counter() - start
+    return {
+        "n_topics": k,
+        "seed": seed,
+        "fit_seconds": fit_seconds,
+        "heldout_perplexity": float(lda.perplexity(_worker["test"])),
+        "umass_coherence": umass_coherence(_worker["train"], lda.components_),
+    }
+
+
+# ----
+# 6) Sweep
+# ----
+def sweep(X, topic_counts=TOPIC_COUNTS, seeds=SEEDS, n_workers=None, results_file=RESULTS_FILE) -> list:
+    """
+    Fit LDA for every (topic count, seed) pair in parallel. Every tenth
+    document is held out for perplexity; coherence is measured on the
+    training documents. Both splits are placed in shared memory once and
+    mapped by every worker. Results are sorted by topic count and seed
+    and written as JSON.
+    Callers must run this under an `if __name__ == "__main__":` guard or
+    from a script that is safe to re-import.
+    """
+    configs = [(k, seed) for k in topic_counts for seed in seeds]
+    n_workers = min(n_workers or os.cpu_count() or 1, len(configs))
+    # float64 up front, so LDA's input validation does not copy per worker
+    X = sp.csr_matrix(X, dtype=np.float64)
+    holdout = np.arange(X.shape[0]) % HOLDOUT_EVERY == 0
+    train, test = SharedCSR(X[~holdout]), SharedCSR(X[holdout])
+    try:
+        with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_worker,
+                                 initargs=(train.spec, test.spec)) as pool:
+            results = list(pool.map(_fit_one, configs))
+    finally:
+        train.close()
+        test.close()
+
+    results.sort(key=lambda r: (r["n_topics"], r["seed"]))
+    if results_file:
+        with open(results_file, "w") as f:
+            json.dump(results, f, indent=2)
+    return results
+
+
+def summarize(results: list) -> list:
+    """Mean perplexity, coherence and fit time per topic count across seeds."""
+    summary = []
+    for k in sorted({r["n_topics"] for r in results}):
+        runs = [r for r in results if r["n_topics"] == k]
+        summary.append({
+            "n_topics": k,
+            "runs": len(runs),
+            "heldout_perplexity": float(np.mean([r["heldout_perplexity"] for r in runs])),
+            "umass_coherence": float(np.mean([r["umass_coherence"] for r in runs])),
+            "fit_seconds": float(np.mean([r["fit_seconds"] for r in runs])),
+        })
+    return summary
@@ -0,0 +1,20 @@
+from near_duplicates import NearDuplicateIndex
+
+LONG = ("The flight from London to New York was delayed by three hours "
+        "and the crew never once explained why")
+
+
+def test_short_reviews_are_never_clustered(tmp_path):
+    index = NearDuplicateIndex(str(tmp_path / "nd.sqlite"))
+    keys = ["a", "b", "c", "d"]
+    assert index.add(keys, ["Excellent", "Excellent", "No content", "No content"]) == keys
+    # ...and later long reviews are not matched against them either
+    assert index.add(["e"], ["Excellent"]) == ["e"]
+    index.close()
+
+
+def test_near_duplicates_share_a_cluster_across_batches(tmp_path):
+    index = NearDuplicateIndex(str(tmp_path / "nd.sqlite"))
+    assert index.add(["a", "b"], [LONG, LONG + " at all"]) == ["a", "a"]
+    assert index.add(["c", "a"], [LONG.upper(), LONG]) == ["a", "a"]
+    index.close()
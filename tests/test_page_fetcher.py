@@ -0,0 +1,86 @@
+import time
+
+import pytest
+
+pytest.importorskip("aiohttp")
+
+from fixture_server import FixtureServer
+from page_fetcher import PageFetcher
+
+PAGES = [f"<html><body><p>listing page {n}</p></body></html>" for n in range(1, 6)]
+
+
+@pytest.fixture
+def serve():
+    servers = []
+
+    def start(pages=PAGES, faults=None):
+        server = FixtureServer(pages, port=0, faults=faults)
+        server.start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def fetcher(server, **kwargs):
+    settings = {"n_sessions": 2, "interval": 0, "jitter": 0, "retries": 2, "backoff": 0.01, "timeout": 5}
+    return PageFetcher(server.base_url, **{**settings, **kwargs})
+
+
+def test_fetches_every_page_in_order(serve):
+    server = serve()
+    assert fetcher(server).fetch(range(1, 6)) == dict(zip(range(1, 6), PAGES))
+
+
+def test_404_marks_the_end(serve):
+    server = serve()
+    f = fetcher(server, n_sessions=1)
+    assert list(f.fetch(range(1, 10))) == [1, 2, 3, 4, 5]
+    assert f.end_page == 6
+    # Nothing past the first 404 is requested
+    assert max(page for page, _ in server.requests) == 6
+
+
+def test_is_end_drops_the_page_and_everything_after(serve):
+    server = serve()
+    f = fetcher(server, n_sessions=1)
+    pages = f.fetch(range(1, 6), is_end=lambda page, html: "page 3" in html)
+    assert list(pages) == [1, 2]
+    assert f.end_page == 3
+
+
+def test_retries_server_errors(serve):
+    server = serve(faults={2: [500, 503]})
+    f = fetcher(server)
+    assert f.fetch([1, 2, 3]) == {1: PAGES[0], 2: PAGES[1], 3: PAGES[2]}
+    assert [status for page, status in server.requests if page == 2] == [500, 503, 200]
+    assert f.failed == {}
+
+
+def test_gives_up_after_the_last_retry(serve):
+    server = serve(faults={2: [502, 502, 502]})
+    f = fetcher(server)
+    assert list(f.fetch([1, 2, 3])) == [1, 3]
+    assert f.failed == {2: "HTTP 502"}
+
+
+def test_429_waits_for_retry_after(serve):
+    server = serve(faults={1: [(429, 1)]})
+    f = fetcher(server, n_sessions=1)
+    start = time.perf_counter()
+    assert f.fetch([1]) == {1: PAGES[0]}
+    # The backoff alone would retry after about 0.01s
+    assert time.perf_counter() - start >= 1
+    assert [status for _, status in server.requests] == [429, 200]
+
+
+def test_other_client_errors_are_not_retried(serve):
+    server = serve(faults={1: [403]})
+    f = fetcher(server)
+    assert f.fetch([1]) == {}
+    assert f.failed == {1: "HTTP 403"}
+    assert server.requests == [(1, 403)]
@@ -0,0 +1,47 @@
+import os
+
+import pytest
+
+pytest.importorskip("lxml")
+pytest.importorskip("bs4")
+
+from conftest import FIXTURES_DIR
+from review_parser import parse_page, parse_page_bs4
+
+
+@pytest.fixture
+def fixture_page():
+    with open(os.path.join(FIXTURES_DIR, "trustpilot_page.html"), encoding="utf-8") as f:
+        return f.read()
+
+
+def test_fixture_page_fields(fixture_page):
+    reviews = parse_page(fixture_page)
+    assert reviews == [
+        {"date": "March 03, 2024", "author": "Jane Traveller", "place": "GB",
+         "content": "Flew LHR to JFK on the A380.Crew were great, food was not.",
+         "overall_rating": 4, "verified": "Verified"},
+        {"date": "November 20, 2023", "author": "NA", "place": "Not specified",
+         "content": "Lost my bag.", "overall_rating": 1, "verified": "Verified"},
+        {"date": "Not specified", "author": "Unknown", "place": "Not specified",
+         "content": "No content", "overall_rating": 0, "verified": "Not Verified"},
+    ]
+
+
+def test_fixture_page_matches_bs4(fixture_page):
+    assert parse_page(fixture_page) == parse_page_bs4(fixture_page)
+
+
+def test_synthetic_pages_match_bs4():
+    synthetic = pytest.importorskip("benchmarks.synthetic")
+    reviews = synthetic.review_table(60, seed=3)
+    for start in range(0, len(reviews), 20):
+        html = synthetic.page_html(reviews.iloc[start:start + 20])
+        expected = parse_page_bs4(html)
+        assert len(expected) == 20
+        assert parse_page(html) == expected
+
+
+def test_empty_and_cardless_pages():
+    assert parse_page("") == []
+    assert parse_page("<html><body><p>Page not found</p></body></html>") == []
@@ -0,0 +1,25 @@
+import pandas as pd
+
+from review_query import AggregateStore
+
+
+def cleaned(rows):
+    return pd.DataFrame(rows, columns=["content", "author", "date", "overall_rating",
+                                       "pred_star_ratings", "pred_sentiment", "pred_aircraft"])
+
+
+def test_zero_rating_is_missing_and_unrated_keys_sort_last(tmp_path):
+    store = AggregateStore(str(tmp_path / "agg.sqlite"))
+    store.add(cleaned([
+        ("a", "x", "2024-01-05", 2, 2.0, "NEGATIVE", "Boeing 777"),
+        ("b", "y", "2024-01-06", 0, 3.0, "POSITIVE", "Boeing 777"),
+        ("c", "z", "2024-02-01", 0, 1.0, "NEGATIVE", "Airbus A380"),
+        ("d", "w", "2024-02-02", 4, 4.0, "POSITIVE", "Airbus A320"),
+    ]))
+    worst = store.worst("aircraft", min_reviews=1)
+    assert worst["key"].tolist() == ["Boeing 777", "Airbus A320", "Airbus A380"]
+    assert worst["mean_rating"].tolist()[:2] == [2.0, 4.0]
+    assert pd.isna(worst["mean_rating"].iloc[2])
+    best = store.summary("aircraft", order="best")
+    assert best["key"].tolist()[-1] == "Airbus A380"
+    store.close()
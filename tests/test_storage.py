@@ -0,0 +1,43 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("pyarrow")
+
+import storage
+
+
+@pytest.fixture(autouse=True)
+def in_tmp(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+
+def test_all_missing_first_chunk_takes_later_strings():
+    with storage.TableWriter("t") as writer:
+        writer.write(pd.DataFrame({
+            "pred_aircraft": pd.Categorical([None, None]),
+            "route_city": [np.nan, np.nan],
+            "origin_city": pd.Series([None, None], dtype=object),
+            "content": ["a", "b"],
+        }))
+        writer.write(pd.DataFrame({
+            "pred_aircraft": ["Boeing 777", None],
+            "route_city": ["London to Paris", None],
+            "origin_city": ["London", None],
+            "content": ["c", "d"],
+        }))
+    df = storage.load_table("t")
+    assert df["pred_aircraft"].tolist()[2] == "Boeing 777"
+    assert df["route_city"].tolist()[2] == "London to Paris"
+    assert df["origin_city"].tolist()[2] == "London"
+    assert df[["pred_aircraft", "route_city", "origin_city"]].isna().sum().tolist() == [3, 3, 3]
+    assert (df.dtypes[["pred_aircraft", "route_city", "origin_city"]] == "category").all()
+
+
+def test_categories_grow_across_chunks():
+    with storage.TableWriter("t") as writer:
+        writer.write(pd.DataFrame({"pred_seat_type": ["Economy Class"], "overall_rating": [3]}))
+        writer.write(pd.DataFrame({"pred_seat_type": ["First Class"], "overall_rating": [5]}))
+    df = storage.load_table("t")
+    assert df["pred_seat_type"].tolist() == ["Economy Class", "First Class"]
+    assert df["overall_rating"].astype(int).tolist() == [3, 5]